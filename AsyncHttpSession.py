@@ -0,0 +1,120 @@
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from HttpSession import HttpSession
+
+
+class TransportError(RuntimeError):
+    """The request got no HTTP answer (connection refused, reset, ...): safe to retry"""
+
+
+@dataclass
+class HttpReply:
+    """Fully read HTTP response returned by AsyncHttpSession"""
+    status: int
+    headers: Dict[str, str]
+    text: str
+    # Seconds from sending the request to receiving the response headers
+    ttfb: float = 0.0
+
+
+class AsyncHttpSession:
+    """
+    Shared aiohttp session for async LLM calls.
+
+    One session and one semaphore per event loop: at most MAX_CONCURRENCY
+    requests are in flight at a time, the rest wait without holding a thread.
+    Sessions of loops closed without close() (every asyncio.run of a
+    long-running process) are closed when the next session is created.
+    aiohttp is imported lazily so the synchronous clients work without it.
+    """
+
+    MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+    _per_loop: Dict[asyncio.AbstractEventLoop, tuple] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _aiohttp():
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise RuntimeError("Async LLM calls require aiohttp: pip install aiohttp") from e
+        return aiohttp
+
+    @classmethod
+    async def _state(cls):
+        loop = asyncio.get_running_loop()
+        stale = []
+        with cls._lock:
+            state = cls._per_loop.get(loop)
+            if state is None:
+                stale = [cls._per_loop.pop(closed)[0] for closed in list(cls._per_loop) if closed.is_closed()]
+                aiohttp = cls._aiohttp()
+                connector = aiohttp.TCPConnector(limit=cls.MAX_CONCURRENCY, keepalive_timeout=60)
+                timeout = aiohttp.ClientTimeout(sock_connect=HttpSession.CONNECT_TIMEOUT,
+                                                sock_read=HttpSession.READ_TIMEOUT)
+                session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+                state = (session, asyncio.Semaphore(cls.MAX_CONCURRENCY))
+                cls._per_loop[loop] = state
+        for dead in stale:
+            await cls._close_stale(dead)
+        return state
+
+    @staticmethod
+    async def _close_stale(session) -> None:
+        """
+        Closes the session of a loop closed without close(). The dead loop cannot
+        shut the connections down: the connector only forgets them, and their
+        sockets are closed when the transports are garbage collected.
+        """
+        try:
+            await session.close()
+        except RuntimeError:
+            session.detach()  # older aiohttp closes the transports through their loop
+
+    @classmethod
+    async def post_json(cls, url: str, payload: Any, headers: Optional[Dict[str, str]] = None,
+                        compress: bool = False, timeout: Optional[float] = None) -> HttpReply:
+        """
+        POSTs payload as JSON and returns the whole response. timeout bounds the
+        full call including the wait for a free slot; cancelling the awaiting task
+        aborts the request and releases its slot.
+        """
+        session, semaphore = await cls._state()
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request_headers = {"Content-Type": "application/json"}
+        request_headers.update(headers or {})
+
+        if compress and len(body) >= HttpSession.GZIP_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=5)
+            request_headers["Content-Encoding"] = "gzip"
+
+        async def send() -> HttpReply:
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.post(url, data=body, headers=request_headers) as response:
+                    ttfb = time.perf_counter() - started
+                    text = await response.text()
+                    return HttpReply(response.status, dict(response.headers), text, ttfb)
+
+        try:
+            return await asyncio.wait_for(send(), timeout)
+        except asyncio.TimeoutError as e:
+            raise RuntimeError(f"Request timed out after {timeout}s: {HttpSession.redact(url)}") from e
+        except cls._aiohttp().ClientError as e:
+            raise TransportError(f"Request failed: {HttpSession.redact(str(e))}") from e
+
+    @classmethod
+    async def close(cls) -> None:
+        """Closes the session of the running loop; call before the loop shuts down"""
+        with cls._lock:
+            state = cls._per_loop.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[0].close()
@@ -0,0 +1,194 @@
+import ast
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+class AutotestMerger:
+    """
+    Merges the file maps produced by several stage 5 shards into one project.
+
+    The result depends only on the shard order, never on which shard finished
+    first. For a path produced by more than one shard with different content:
+    - test modules (test_*.py, *_test.py) are all kept; the second and later
+      versions get a numeric suffix (tests/test_form.py -> tests/test_form_2.py);
+    - other Python modules (conftest.py, page objects, test data, utilities)
+      are merged into the first version: missing imports, top-level functions,
+      classes, assignments, class members and dict/list entries of the later
+      versions are added, existing definitions are never replaced;
+    - requirements*.txt and .gitignore get the union of their lines;
+    - any other file (README.md, pytest.ini, ...) keeps the first version.
+    """
+
+    TEST_MODULE_PATTERN = re.compile(r"(?:^|/)(?:test_[^/]*|[^/]*_test)\.py$")
+    LINE_UNION_PATTERN = re.compile(r"(?:^|/)(?:requirements[^/]*\.txt|\.gitignore)$")
+
+    @classmethod
+    def merge(cls, file_maps: List[Dict[str, str]]) -> Dict[str, str]:
+        versions: Dict[str, List[str]] = {}
+        for files in file_maps:
+            for path, content in files.items():
+                contents = versions.setdefault(path, [])
+                if content not in contents:
+                    contents.append(content)
+
+        merged: Dict[str, str] = {}
+        for path, contents in versions.items():
+            if len(contents) == 1:
+                merged[path] = contents[0]
+            elif cls.TEST_MODULE_PATTERN.search(path.replace(os.sep, "/")):
+                merged[path] = contents[0]
+                stem = path[:-len(".py")]
+                suffix = 2
+                for content in contents[1:]:
+                    while f"{stem}_{suffix}.py" in versions or f"{stem}_{suffix}.py" in merged:
+                        suffix += 1
+                    merged[f"{stem}_{suffix}.py"] = content
+                    suffix += 1
+            elif path.endswith(".py"):
+                merged[path] = cls.merge_python(contents, path)
+            elif cls.LINE_UNION_PATTERN.search(path.replace(os.sep, "/")):
+                lines = dict.fromkeys(line for content in contents for line in content.splitlines())
+                merged[path] = "\n".join(lines)
+            else:
+                merged[path] = contents[0]
+        return merged
+
+    @classmethod
+    def merge_python(cls, sources: List[str], path: str = "<module>") -> str:
+        merged = sources[0]
+        for source in sources[1:]:
+            try:
+                merged = cls._merge_two(merged, source)
+            except SyntaxError as e:
+                print(f"Warning: cannot merge shard versions of {path} ({e.msg}), keeping the first one")
+        return merged
+
+    @classmethod
+    def _merge_two(cls, base: str, other: str) -> str:
+        base_tree = ast.parse(base)
+        other_tree = ast.parse(other)
+        base_lines = base.splitlines()
+        other_lines = other.splitlines()
+
+        base_nodes = {key: node for node in base_tree.body if (key := cls._key(node)) is not None}
+        base_texts = {cls._segment(base_lines, node) for node in base_tree.body}
+        imports = [node for node in base_tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+        import_line = imports[-1].end_lineno if imports else cls._docstring_end(base_tree)
+
+        # (first line, last line, replacement text) in base line numbers; insertions have last = first - 1
+        edits: List[Tuple[int, int, str]] = []
+        new_imports: List[str] = []
+        appended: List[str] = []
+        for node in other_tree.body:
+            text = cls._segment(other_lines, node)
+            if text in base_texts:
+                continue
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                new_imports.append(text)
+                continue
+            key = cls._key(node)
+            existing = base_nodes.get(key) if key is not None else None
+            if existing is None:
+                appended.append(text)
+            elif isinstance(existing, ast.ClassDef) and isinstance(node, ast.ClassDef):
+                members = cls._missing_members(existing, node, other_lines)
+                if members:
+                    edits.append((existing.end_lineno + 1, existing.end_lineno, "\n" + "\n\n".join(members)))
+            elif key[0] == "assign":
+                combined = cls._combine_literals(existing, node, base_lines, other_lines)
+                if combined is not None:
+                    edits.append((cls._start(existing), existing.end_lineno, combined))
+
+        if new_imports:
+            edits.append((import_line + 1, import_line, "\n".join(new_imports)))
+
+        # Bottom-up, so earlier line numbers stay valid
+        lines = list(base_lines)
+        for first, last, text in sorted(edits, key=lambda edit: edit[0], reverse=True):
+            lines[first - 1:last] = text.split("\n")
+        if appended:
+            while lines and not lines[-1].strip():
+                lines.pop()
+            lines += ("\n\n" + "\n\n\n".join(appended)).split("\n")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _key(node: ast.stmt) -> Optional[Tuple[str, str]]:
+        """Name of a top-level definition or of the single target of an assignment"""
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            return "def", node.name
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            return "assign", node.targets[0].id
+        if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            return "assign", node.target.id
+        return None
+
+    @classmethod
+    def _missing_members(cls, base: ast.ClassDef, other: ast.ClassDef, other_lines: List[str]) -> List[str]:
+        names = {key for node in base.body if (key := cls._key(node)) is not None}
+        return [cls._segment(other_lines, node) for node in other.body
+                if (key := cls._key(node)) is not None and key not in names]
+
+    @classmethod
+    def _combine_literals(cls, base: ast.stmt, other: ast.stmt, base_lines: List[str],
+                          other_lines: List[str]) -> Optional[str]:
+        """
+        Both versions assign a dict (or both a list) literal: the base statement
+        rewritten with the missing keys (items) of the other one appended.
+        """
+        base_value, other_value = base.value, other.value
+        if isinstance(base_value, ast.Dict) and isinstance(other_value, ast.Dict):
+            if None in base_value.keys or None in other_value.keys:
+                return None  # {**spread} entries
+            existing = {cls._segment(base_lines, key) for key in base_value.keys}
+            added = [f"{cls._segment(other_lines, key)}: {cls._segment(other_lines, value)}"
+                     for key, value in zip(other_value.keys, other_value.values)
+                     if cls._segment(other_lines, key) not in existing]
+            entries = [f"{cls._segment(base_lines, key)}: {cls._segment(base_lines, value)}"
+                       for key, value in zip(base_value.keys, base_value.values)]
+            brackets = "{}"
+        elif isinstance(base_value, ast.List) and isinstance(other_value, ast.List):
+            entries = [cls._segment(base_lines, item) for item in base_value.elts]
+            added = [text for item in other_value.elts if (text := cls._segment(other_lines, item)) not in entries]
+            brackets = "[]"
+        else:
+            return None
+        if not added:
+            return None
+
+        if base_value.lineno != base.lineno:
+            return None  # value starts on a continuation line: leave the statement alone
+        prefix = _columns(base_lines[base.lineno - 1], 0, base_value.col_offset)
+        body = "".join(f"    {entry},\n" for entry in entries + added)
+        return f"{prefix}{brackets[0]}\n{body}{brackets[1]}"
+
+    @staticmethod
+    def _start(node: ast.stmt) -> int:
+        """First line of a statement including its decorators"""
+        decorators = getattr(node, "decorator_list", [])
+        return min([node.lineno] + [decorator.lineno for decorator in decorators])
+
+    @classmethod
+    def _segment(cls, lines: List[str], node: ast.AST) -> str:
+        """Source text of a node: whole lines for statements, exact columns for expressions"""
+        if isinstance(node, ast.stmt):
+            return "\n".join(lines[cls._start(node) - 1:node.end_lineno])
+        if node.lineno == node.end_lineno:
+            return _columns(lines[node.lineno - 1], node.col_offset, node.end_col_offset)
+        first = _columns(lines[node.lineno - 1], node.col_offset, None)
+        last = _columns(lines[node.end_lineno - 1], 0, node.end_col_offset)
+        return "\n".join([first, *lines[node.lineno:node.end_lineno - 1], last])
+
+    @staticmethod
+    def _docstring_end(tree: ast.Module) -> int:
+        if tree.body and isinstance(tree.body[0], ast.Expr) and isinstance(tree.body[0].value, ast.Constant) \
+                and isinstance(tree.body[0].value.value, str):
+            return tree.body[0].end_lineno
+        return 0
+
+
+def _columns(line: str, start: int, end: Optional[int]) -> str:
+    """ast column offsets are UTF-8 byte offsets"""
+    data = line.encode("utf-8")
+    return data[start:end].decode("utf-8")
@@ -0,0 +1,196 @@
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class AutotestStreamParser:
+    """
+    Single-pass parser for the stage 5 LLM output ("### Project Code"
+    section with "autotests/<path>" headers, each followed by a code block).
+
+    parse() and iter_files() scan a whole text once: one precompiled regex
+    jumps between file headers and fence lines, and every file is sliced out
+    of the text exactly once. feed()/close() run the same state machine on
+    text arriving in arbitrary chunks; a file is returned as soon as the next
+    header (or the end of the stream) shows that it is complete.
+
+    Fences are resolved per file body:
+    - the first fence opens the file's code block; text before it is ignored;
+    - a fence with an info string (```python) always opens a nested block;
+    - a bare ``` closes the innermost block, unless enough bare fences follow
+      in the body to also close everything still open and either the file's
+      block is ```markdown/```md (a README with a ``` tree inside keeps its
+      tree) or the remaining fences reach the next header with no prose
+      between them - then it opens a nested block. A bare-fenced snippet
+      after the file's code block ("To run:" + ```pytest -q```) is not code;
+    - an unterminated block runs to the end of the body. File headers always
+      end the body, so a missing closing fence never swallows the next file.
+    A body without fences is taken as is.
+    """
+
+    SECTION_HEADER = "### Project Code"
+    SECTION_PATTERN = re.compile(r"^### Project Code\r?$", re.MULTILINE)
+    # Lines that matter: file headers and fences, optionally indented
+    MARKER_PATTERN = re.compile(
+        r"^[^\S\n]*(?:autotests/(?P<path>[a-zA-Z0-9_\-./]+)|(?P<fence>```)(?P<info>[^\n]*))",
+        re.MULTILINE,
+    )
+
+    def __init__(self, root_dir: str = "autotests"):
+        self.root_dir = root_dir
+        self._pending = ""
+        self._in_section = False
+        self._path: Optional[str] = None
+        self._lines: List[str] = []
+        self._fences: List[Tuple[int, str]] = []  # (index in _lines, info string)
+
+    @classmethod
+    def parse(cls, text: str, root_dir: str = "autotests") -> Dict[str, str]:
+        """Whole-text parse: {root_dir/path: content}; a repeated path keeps the last content"""
+        return dict(cls.iter_files(text, root_dir))
+
+    @classmethod
+    def iter_files(cls, text: str, root_dir: str = "autotests") -> Iterator[Tuple[str, str]]:
+        section = cls.SECTION_PATTERN.search(text)
+        if section is None:
+            print("Warning: '### Project Code' section not found in the description text. No files will be parsed.")
+            return
+
+        path = None
+        body_start = 0
+        fences: List[Tuple[int, int, str]] = []  # (line start, line end, info string)
+        for match in cls.MARKER_PATTERN.finditer(text, section.end() + 1):
+            line_end = text.find("\n", match.end())
+            if line_end == -1:
+                line_end = len(text)
+            if match.group("path") is not None:
+                if path is not None:
+                    yield cls._slice(text, root_dir, path, body_start, match.start(), fences)
+                path = match.group("path")
+                body_start = line_end + 1
+                fences = []
+            elif path is not None:
+                fences.append((match.start(), line_end, match.group("info")))
+        if path is not None:
+            yield cls._slice(text, root_dir, path, body_start, len(text), fences)
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consumes a chunk of text and returns the files completed by it"""
+        completed = []
+        data = self._pending + chunk
+        start = 0
+        while True:
+            newline = data.find("\n", start)
+            if newline == -1:
+                break
+            self._feed_line(data[start:newline].rstrip("\r"), completed)
+            start = newline + 1
+        self._pending = data[start:]
+        return completed
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flushes the last (possibly unterminated) line and the last file"""
+        completed = []
+        if self._pending:
+            # The section header only counts when followed by a newline
+            if self._in_section:
+                self._feed_line(self._pending.rstrip("\r"), completed)
+            self._pending = ""
+        self._finish_file(completed)
+        if not self._in_section:
+            print("Warning: '### Project Code' section not found in the description text. No files will be parsed.")
+        return completed
+
+    def _feed_line(self, line: str, completed: List[Tuple[str, str]]) -> None:
+        if not self._in_section:
+            self._in_section = line == self.SECTION_HEADER
+            return
+
+        match = self.MARKER_PATTERN.match(line)
+        if match is not None and match.group("path") is not None:
+            self._finish_file(completed)
+            self._path = match.group("path")
+            self._lines = []
+            self._fences = []
+            return
+
+        if self._path is None:
+            return
+        if match is not None:
+            self._fences.append((len(self._lines), match.group("info")))
+        self._lines.append(line)
+
+    def _finish_file(self, completed: List[Tuple[str, str]]) -> None:
+        if self._path is None:
+            return
+        fences = self._fences
+        # Non-blank lines after each fence, up to the next fence or the end of the body
+        prose = [any(line.strip() for line in self._lines[index + 1:(fences[k + 1][0] if k + 1 < len(fences)
+                                                                      else len(self._lines))])
+                 for k, (index, _) in enumerate(fences)]
+        block = self._resolve([info for _, info in fences], prose)
+        if block is None:
+            content = "\n".join(self._lines)
+        else:
+            opening, closing = block
+            end = self._fences[closing][0] if closing is not None else len(self._lines)
+            content = "\n".join(self._lines[self._fences[opening][0] + 1:end])
+        completed.append((os.path.join(self.root_dir, self._path), content.strip()))
+        self._path = None
+        self._lines = []
+        self._fences = []
+
+    @classmethod
+    def _slice(cls, text: str, root_dir: str, path: str, body_start: int, body_end: int,
+               fences: List[Tuple[int, int, bool]]) -> Tuple[str, str]:
+        prose = [bool(text[end + 1:(fences[k + 1][0] if k + 1 < len(fences) else body_end)].strip())
+                 for k, (_, end, _) in enumerate(fences)]
+        block = cls._resolve([info for _, _, info in fences], prose)
+        if block is None:
+            start, end = body_start, body_end
+        else:
+            opening, closing = block
+            start = fences[opening][1] + 1
+            end = fences[closing][0] if closing is not None else body_end
+        content = text[start:end].strip()
+        if "\r" in content:
+            content = content.replace("\r\n", "\n")
+        return os.path.join(root_dir, path), content
+
+    @staticmethod
+    def _is_bare(info: str) -> bool:
+        return not info.strip("` \t\r")
+
+    MARKDOWN_INFO = frozenset({"markdown", "md"})
+
+    @classmethod
+    def _resolve(cls, infos: List[str], prose: List[bool]) -> Optional[Tuple[int, Optional[int]]]:
+        """
+        Indices of the opening fence and of the fence closing the first code
+        block (None if unterminated); None when there are no fences at all.
+        prose[i] tells whether non-blank text follows fence i before the next one.
+        """
+        if not infos:
+            return None
+        bare_fences = [cls._is_bare(info) for info in infos]
+        markdown = infos[0].strip("` \t\r").lower() in cls.MARKDOWN_INFO
+        # prose_after[i]: some fence from i on is followed by text (the fences do not run on to the header)
+        prose_after = list(prose)
+        for index in range(len(prose) - 2, -1, -1):
+            prose_after[index] = prose_after[index] or prose_after[index + 1]
+        depth = 1
+        bare_left = sum(bare_fences[1:])
+        info_left = len(bare_fences) - 1 - bare_left
+        for index in range(1, len(bare_fences)):
+            if not bare_fences[index]:
+                depth += 1
+                info_left -= 1
+                continue
+            # Bare fences left after closing every open block and every block still to be opened
+            spare = bare_left - depth - info_left
+            bare_left -= 1
+            nested = spare >= 2 and (markdown or not prose_after[index])
+            depth += 1 if nested else -1
+            if depth == 0:
+                return 0, index
+        return 0, None
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from FilesUtil import FilesUtil
+
+
+class AutotestSync:
+    """
+    Incremental update of the generated autotests directory.
+
+    A manifest in the directory records, for every file the pipeline wrote,
+    the sha256 of its content plus the size and mtime it had on disk. A file
+    is rewritten only when the new content hash differs or the file was
+    changed on disk since; writes go through a temp file and a rename.
+    finish() deletes the files of the previous run that were not produced
+    again, but only those still untouched since the pipeline wrote them -
+    user files and hand-edited files are never removed. A run that fails
+    midway calls save() instead, so the files it already wrote are known
+    to the next run.
+    """
+
+    MANIFEST = ".autotests_manifest.json"
+    # Left in the directory by running the tests, not by the pipeline
+    CACHE_DIRS = frozenset({"__pycache__", ".pytest_cache"})
+
+    def __init__(self, root_dir: str):
+        self.root = Path(root_dir)
+        self.manifest_path = self.root / self.MANIFEST
+        self.previous = self._load_manifest()
+        self.current: Dict[str, dict] = {}
+        self.statuses: Dict[str, str] = {}
+        self.removed = 0
+
+    def write(self, path: str, content: str) -> str:
+        """Writes path unless it already holds content; returns 'added', 'changed' or 'unchanged'"""
+        key = self._key(path)
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        p = Path(path)
+        stat = self._stat(p)
+        entry = self.previous.get(key)
+
+        if stat is None:
+            status = "added"
+        elif entry is not None and entry["sha256"] == digest and self._untouched(entry, stat):
+            status = "unchanged"
+        elif entry is None and self._disk_digest(p) == digest:
+            # Not in the manifest yet (first synced run): an identical file is adopted as is
+            status = "unchanged"
+        else:
+            status = "changed"
+
+        if status != "unchanged":
+            FilesUtil.write_atomic(path, content)
+            stat = p.stat()
+        self.current[key] = {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        # A file written twice in one run (streamed, then finalized) keeps its first status unless it changed
+        if self.statuses.get(key) not in ("added", "changed"):
+            self.statuses[key] = status
+        return status
+
+    def keep(self, path: str) -> None:
+        """Marks an existing file as still produced without rewriting it"""
+        key = self._key(path)
+        if key in self.previous:
+            self.current[key] = self.previous[key]
+            self.statuses.setdefault(key, "unchanged")
+
+    def finish(self) -> Dict[str, int]:
+        """Removes stale files of the previous run, saves the manifest and returns the counts"""
+        for key, entry in self.previous.items():
+            if key in self.current:
+                continue
+            p = self.root / key
+            stat = self._stat(p)
+            if stat is None:
+                continue
+            if not self._untouched(entry, stat):
+                print(f"Warning: keeping stale file modified since generation: {p}")
+                continue
+            p.unlink()
+            self.removed += 1
+            self._remove_empty_parents(p.parent)
+
+        self._save_manifest(self.current)
+        return self.counts()
+
+    def save(self) -> None:
+        """Records the files written so far on top of the previous manifest, removing nothing (a failed run)"""
+        if self.current:
+            self._save_manifest({**self.previous, **self.current})
+
+    @classmethod
+    def snapshot(cls, root_dir: str) -> Dict[str, Optional[str]]:
+        """
+        sha256 of the generated files now in root_dir (None for a deleted one):
+        those of the manifest, or every file when the directory has none.
+        Files untouched since they were written are not read again.
+        """
+        sync = cls(root_dir)
+        if sync.previous:
+            keys = sorted(sync.previous)
+        elif sync.root.is_dir():
+            keys = sorted(p.relative_to(sync.root).as_posix() for p in sync.root.rglob("*")
+                          if p.is_file() and not cls.CACHE_DIRS.intersection(p.relative_to(sync.root).parts))
+        else:
+            keys = []
+        digests = {}
+        for key in keys:
+            p = sync.root / key
+            stat = cls._stat(p)
+            entry = sync.previous.get(key)
+            if stat is None:
+                digests[key] = None
+            elif entry is not None and cls._untouched(entry, stat):
+                digests[key] = entry["sha256"]
+            else:
+                digests[key] = cls._disk_digest(p)
+        return digests
+
+    def counts(self) -> Dict[str, int]:
+        counts = {"added": 0, "changed": 0, "unchanged": 0, "removed": self.removed}
+        for status in self.statuses.values():
+            counts[status] += 1
+        return counts
+
+    def _key(self, path: str) -> str:
+        return Path(os.path.relpath(path, self.root)).as_posix()
+
+    def _load_manifest(self) -> Dict[str, dict]:
+        if not self.manifest_path.is_file():
+            return {}
+        try:
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except ValueError:
+            print(f"Warning: ignoring unreadable manifest {self.manifest_path}")
+            return {}
+
+    def _save_manifest(self, entries: Dict[str, dict]) -> None:
+        FilesUtil.write_atomic(str(self.manifest_path), json.dumps(entries, indent=1, sort_keys=True))
+
+    def _remove_empty_parents(self, directory: Path) -> None:
+        """Deletes the directories left empty by removed files, up to the root"""
+        while directory != self.root and self.root in directory.parents:
+            try:
+                directory.rmdir()
+            except OSError:
+                return
+            directory = directory.parent
+
+    @staticmethod
+    def _stat(p: Path) -> Optional[os.stat_result]:
+        try:
+            return p.stat()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _untouched(entry: dict, stat: os.stat_result) -> bool:
+        return entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+
+    @staticmethod
+    def _disk_digest(p: Path) -> str:
+        try:
+            return hashlib.sha256(p.read_text(encoding="utf-8").encode("utf-8")).hexdigest()
+        except (OSError, UnicodeDecodeError):
+            return ""
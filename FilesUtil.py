@@ -1,12 +1,20 @@
+import os
+import threading
 from pathlib import Path
 import shutil
 
+from Tracer import Tracer
+
 
 class FilesUtil:
     @staticmethod
     def read(path: str) -> str:
         try:
-            return Path(path).read_text(encoding="utf-8")
+            p = Path(path)
+            text = p.read_text(encoding="utf-8")
+            if Tracer.ENABLED:
+                Tracer.count("bytes_read", p.stat().st_size)
+            return text
         except Exception as e:
             raise RuntimeError(f"Cannot read file: {path}") from e
 
@@ -17,7 +25,25 @@ class FilesUtil:
             if p.parent:
                 p.parent.mkdir(parents=True, exist_ok=True)
             p.write_text(content, encoding="utf-8")
+            if Tracer.ENABLED:
+                Tracer.count("bytes_written", p.stat().st_size)
+        except Exception as e:
+            raise RuntimeError(f"Cannot write file: {path}") from e
+
+    @staticmethod
+    def write_atomic(path: str, content: str) -> None:
+        """Writes a sibling temp file and renames it over path: readers never see a partial file"""
+        p = Path(path)
+        tmp = p.with_name(f".{p.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            if p.parent:
+                p.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(content, encoding="utf-8")
+            os.replace(tmp, p)
+            if Tracer.ENABLED:
+                Tracer.count("bytes_written", p.stat().st_size)
         except Exception as e:
+            tmp.unlink(missing_ok=True)
             raise RuntimeError(f"Cannot write file: {path}") from e
 
     @staticmethod
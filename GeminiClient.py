@@ -1,46 +1,146 @@
-import os
 import json
-import requests
+import os
+from typing import Optional
+
+from AsyncHttpSession import AsyncHttpSession
+from HttpSession import HttpSession
+from RateLimiter import RateLimiter
+from ResponseCache import ResponseCache
+from Tracer import Tracer
 
 
 class GeminiClient:
-    API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key="
+    API_URL = os.getenv(
+        "GEMINI_API_URL",
+        "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key=",
+    )
     API_KEY = os.getenv("GEMINI_API_KEY")
+    MODEL = "gemini-2.5-flash"
+    TEMPERATURE = 0.2
+    SYSTEM_PROMPT = "You are Senior QA automation engineer. Return structured output."
+    # Off by default: enable only if the endpoint accepts Content-Encoding: gzip
+    GZIP_REQUESTS = os.getenv("GEMINI_GZIP_REQUESTS", "0") == "1"
 
     @classmethod
     def call(cls, prompt: str) -> str:
-        if not cls.API_KEY or cls.API_KEY.strip() == "":
-            raise RuntimeError("GEMINI_API_KEY not set")
+        with Tracer.span("gemini.call", "llm", model=cls.MODEL) as span:
+            cache = ResponseCache.default()
+            cache_key = cls._cache_key(prompt)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                span.set(cached=True, **cls._usage(cached))
+                return cached
 
-        try:
-            # Аналог safePrompt из Java, но через JSON безопаснее
-            body = {
-                "contents": [
-                    {
-                        "parts": [
-                            {
-                                "text": "You are Senior QA automation engineer. Return structured output."
-                            }
-                        ]
-                    }
-                ],
-
-                "generationConfig": {
-                    "temperature": 0.2
-                }
-            }
+            cls._check_api_key()
 
-            headers = {
-                "Content-Type": "application/json",
-                # "Authorization": f"Bearer {cls.API_KEY}",
-            }
+            try:
+                headers = {
+                    # "Authorization": f"Bearer {cls.API_KEY}",
+                }
 
-            response = requests.post(cls.API_URL + cls.API_KEY, headers=headers, data=json.dumps(body))
-            response.raise_for_status()
+                response = RateLimiter.for_provider("gemini").call(
+                    lambda: HttpSession.post_json(cls.API_URL + cls.API_KEY, cls._body(prompt), headers,
+                                                  compress=cls.GZIP_REQUESTS),
+                    prompt, lambda r: cls._total_tokens(r.text),
+                )
+            except Exception as e:
+                # The request URL carries the API key: never let it into the message or the trace
+                raise RuntimeError(f"Request to Gemini failed: {HttpSession.redact(str(e))}") from None
+            if response.status_code >= 400:
+                raise RuntimeError(f"{response.status_code} Error for Gemini generateContent: "
+                                   f"{HttpSession.redact(response.text[:500])}")
 
+            span.set(cached=False, ttfb=response.elapsed.total_seconds(),
+                     response_bytes=len(response.content), **cls._usage(response.text))
+            cache.put(cache_key, response.text, provider="gemini", model=cls.MODEL)
             # Возвращаем «сырой» JSON как строку, как и в Java
-            print(response.text)
             return response.text
 
-        except Exception as e:
-            raise RuntimeError(str(e)) from e
+    @classmethod
+    async def acall(cls, prompt: str, timeout: Optional[float] = None) -> str:
+        """Async counterpart of call(), bounded by AsyncHttpSession.MAX_CONCURRENCY"""
+        span = Tracer.start("gemini.acall", "llm", model=cls.MODEL)
+        try:
+            cache = ResponseCache.default()
+            cache_key = cls._cache_key(prompt)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                span.set(cached=True, **cls._usage(cached))
+                return cached
+
+            cls._check_api_key()
+
+            reply = await RateLimiter.for_provider("gemini").acall(
+                lambda: AsyncHttpSession.post_json(cls.API_URL + cls.API_KEY, cls._body(prompt),
+                                                   compress=cls.GZIP_REQUESTS),
+                prompt, lambda r: cls._total_tokens(r.text), timeout=timeout,
+            )
+            if reply.status >= 400:
+                raise RuntimeError(f"{reply.status} Error for Gemini generateContent")
+
+            span.set(cached=False, ttfb=reply.ttfb, response_bytes=len(reply.text.encode("utf-8")),
+                     **cls._usage(reply.text))
+            cache.put(cache_key, reply.text, provider="gemini", model=cls.MODEL)
+            return reply.text
+        finally:
+            span.finish()
+
+    @staticmethod
+    def extract_content(raw_json: str) -> str:
+        """Текст ответа из generateContent: candidates[].content.parts[].text"""
+        try:
+            data = json.loads(raw_json)
+            return "".join(
+                part.get("text", "")
+                for candidate in data.get("candidates", [])
+                for part in (candidate.get("content") or {}).get("parts", [])
+                if isinstance(part, dict)
+            )
+        except (ValueError, AttributeError, TypeError) as e:
+            raise RuntimeError("Failed to extract content from Gemini API response") from e
+
+    @classmethod
+    def _cache_key(cls, prompt: str) -> str:
+        return ResponseCache.key("gemini", cls.MODEL, cls.TEMPERATURE, prompt, cls.SYSTEM_PROMPT)
+
+    @classmethod
+    def _check_api_key(cls) -> None:
+        if not cls.API_KEY or cls.API_KEY.strip() == "":
+            raise RuntimeError("GEMINI_API_KEY not set")
+
+    @staticmethod
+    def _usage(raw_json: str) -> dict:
+        """Token counts from 'usageMetadata' of a generateContent body (for the trace)"""
+        if not Tracer.ENABLED:
+            return {}
+        try:
+            usage = json.loads(raw_json).get("usageMetadata") or {}
+        except (ValueError, AttributeError):
+            return {}
+        return {
+            "prompt_tokens": usage.get("promptTokenCount", 0),
+            "completion_tokens": usage.get("candidatesTokenCount", 0),
+        }
+
+    @staticmethod
+    def _total_tokens(raw_json: str) -> int:
+        """Сколько токенов засчитал провайдер (для лимита токенов в минуту)"""
+        return (json.loads(raw_json).get("usageMetadata") or {}).get("totalTokenCount", 0)
+
+    @classmethod
+    def _body(cls, prompt: str) -> dict:
+        # Аналог safePrompt из Java, но через JSON безопаснее
+        return {
+            "systemInstruction": {
+                "parts": [{"text": cls.SYSTEM_PROMPT}]
+            },
+            "contents": [
+                {
+                    "role": "user",
+                    "parts": [{"text": prompt}]
+                }
+            ],
+            "generationConfig": {
+                "temperature": cls.TEMPERATURE
+            }
+        }
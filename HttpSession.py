@@ -0,0 +1,79 @@
+import gzip
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpSession:
+    """
+    Shared pooled HTTP session for the LLM clients.
+
+    One requests.Session per process: connections are kept alive and reused
+    between pipeline stages, so only the first call pays for TCP and TLS
+    handshakes. The urllib3 pool behind it is thread-safe and holds up to
+    POOL_SIZE connections per host.
+    """
+
+    POOL_SIZE = int(os.getenv("LLM_HTTP_POOL_SIZE", "16"))
+    CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+    READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "300"))
+    # Request bodies at least this large are gzip-compressed when the caller allows it
+    GZIP_MIN_BYTES = int(os.getenv("LLM_GZIP_MIN_BYTES", "1024"))
+    # API keys passed in the query string (Gemini ?key=...)
+    SECRET_PARAM_PATTERN = re.compile(r"([?&](?:key|api_key|access_token)=)[^&\s'\")]+", re.IGNORECASE)
+
+    _session = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def session(cls) -> requests.Session:
+        with cls._lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=cls.POOL_SIZE, pool_block=True)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Connection": "keep-alive", "Accept-Encoding": "gzip, deflate"})
+                cls._session = session
+            return cls._session
+
+    @classmethod
+    def post_json(cls, url: str, payload: Any, headers: Optional[Dict[str, str]] = None,
+                  compress: bool = False, stream: bool = False) -> requests.Response:
+        """
+        POSTs payload as JSON over the shared session with connect/read timeouts.
+        With compress=True, large bodies are sent with Content-Encoding: gzip.
+        """
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request_headers = {"Content-Type": "application/json"}
+        request_headers.update(headers or {})
+
+        if compress and len(body) >= cls.GZIP_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=5)
+            request_headers["Content-Encoding"] = "gzip"
+
+        return cls.session().post(
+            url,
+            data=body,
+            headers=request_headers,
+            timeout=(cls.CONNECT_TIMEOUT, cls.READ_TIMEOUT),
+            stream=stream,
+        )
+
+    @classmethod
+    def redact(cls, text: str) -> str:
+        """Error text with query-string secrets masked: safe for logs, traces and job status"""
+        return cls.SECRET_PARAM_PATTERN.sub(r"\1***", text)
+
+    @classmethod
+    def close(cls) -> None:
+        """Closes pooled connections; the next call opens a new session"""
+        with cls._lock:
+            if cls._session is not None:
+                cls._session.close()
+                cls._session = None
@@ -1,26 +1,61 @@
+import json
+import re
+from typing import Any, Iterator, List, Tuple
+
+
 class JsonExtractor:
+    # Candidate starts of top-level JSON values: '{' before a key or '}', '[' before a value or ']'.
+    # Braces in prose ("{see below}", "[SECRET]") are skipped without calling the decoder, since
+    # every JSONDecodeError counts the line breaks from the start of the text.
+    VALUE_START_PATTERN = re.compile(r'\{(?=\s*["}])|\[(?=\s*(?:[\[\]{"\-0-9]|true|false|null))')
+    # strict=False: LLM often puts raw line breaks inside strings
+    DECODER = json.JSONDecoder(strict=False)
+
     @staticmethod
     def extract_json(text: str) -> str:
         """
         Аналог Java-метода extractJson.
-        Удаляет markdown-ограждения ```json / ``` и возвращает
-        подстроку от первой '{' до последней '}' включительно.
+        Возвращает самый длинный корректный JSON-объект или массив из ответа
+        LLM как есть (подстрокой исходного текста). Markdown-ограждения
+        ```json и фигурные скобки в окружающем тексте не мешают.
         """
         if text is None:
             raise RuntimeError("LLM returned null")
 
-        # remove markdown fences
-        cleaned = (
-            text.replace("```json", "")
-            .replace("```", "")
-            .strip()
-        )
+        best = None
+        for start, end, _ in JsonExtractor.iter_values(text):
+            if best is None or end - start > best[1] - best[0]:
+                best = (start, end)
 
-        # try to cut everything before first {
-        start = cleaned.find("{")
-        end = cleaned.rfind("}")
-
-        if start == -1 or end == -1:
+        if best is None:
             raise RuntimeError("No JSON object found in LLM output")
 
-        return cleaned[start : end + 1].strip()
+        return text[best[0]:best[1]]
+
+    @staticmethod
+    def extract_all(text: str) -> List[Any]:
+        """Все JSON-объекты и массивы верхнего уровня в порядке появления (уже разобранные)"""
+        if text is None:
+            raise RuntimeError("LLM returned null")
+        return [value for _, _, value in JsonExtractor.iter_values(text)]
+
+    @staticmethod
+    def iter_values(text: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Один проход по тексту: (start, end, value) для каждого JSON-значения
+        верхнего уровня. Текст не копируется: raw_decode разбирает его с
+        позиции-кандидата. После неудачи поиск продолжается с места ошибки.
+        """
+        pos = 0
+        while True:
+            match = JsonExtractor.VALUE_START_PATTERN.search(text, pos)
+            if match is None:
+                return
+            start = match.start()
+            try:
+                value, end = JsonExtractor.DECODER.raw_decode(text, start)
+            except json.JSONDecodeError as e:
+                pos = max(start + 1, e.pos)
+                continue
+            yield start, end, value
+            pos = end
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import GeminiClient
+import MistralClient
+from ResponseCache import ResponseCache
+from Tracer import Tracer
+
+
+@dataclass
+class LlmReply:
+    provider: str
+    raw: str   # provider response body, saved as the stage *_raw.json artifact
+    text: str  # assistant text extracted from it
+
+
+class LlmProvider:
+    """
+    One LLM backend (a client class with call/acall) plus the latencies of
+    its recent answers, which drive the hedge delay.
+    """
+
+    WINDOW = 200
+
+    def __init__(self, name: str, client: type, extract: Callable[[str], str]):
+        self.name = name
+        self.client = client
+        self.extract = extract
+        self._latencies = deque(maxlen=self.WINDOW)
+        self._lock = threading.Lock()
+
+    def call(self, prompt: str) -> LlmReply:
+        cached = self.cached(prompt)
+        if cached is not None:
+            return cached  # not a latency sample: it would drag the hedge delay towards 0
+        started = time.perf_counter()
+        raw = self.client.call(prompt)
+        self.record(time.perf_counter() - started)
+        return LlmReply(self.name, raw, self.extract(raw))
+
+    async def acall(self, prompt: str) -> LlmReply:
+        started = time.perf_counter()
+        try:
+            raw = await self.client.acall(prompt)
+        except asyncio.CancelledError:
+            # A cancelled request took at least this long: keeps the tail of the statistics honest
+            self.record(time.perf_counter() - started)
+            raise
+        self.record(time.perf_counter() - started)
+        return LlmReply(self.name, raw, self.extract(raw))
+
+    def cached(self, prompt: str) -> Optional[LlmReply]:
+        raw = ResponseCache.default().get(self.client._cache_key(prompt), count_miss=False)
+        return LlmReply(self.name, raw, self.extract(raw)) if raw is not None else None
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile of the recent latencies, None without samples"""
+        with self._lock:
+            ordered = sorted(self._latencies)
+        if not ordered:
+            return None
+        index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+        return ordered[index]
+
+    def samples(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        return {"samples": self.samples(), **{f"p{q}": self.percentile(q) for q in (50, 95, 99)}}
+
+
+class LlmRouter:
+    """
+    Sends stage prompts to the primary provider and, with hedging on, to a
+    second one when the first has not answered within the hedge delay (the
+    LLM_HEDGE_PERCENTILE of the primary's recent latencies). The first good
+    answer wins and the other request is cancelled; a failed first request
+    fails over to the second provider at once.
+
+    Hedged requests run on one background asyncio loop (aiohttp), so the
+    losing request is really aborted; the calling stage thread just waits.
+    LLM_HEDGE=auto (default) hedges when a Gemini key is set and aiohttp is
+    installed, 1 forces it on, 0 off.
+    """
+
+    PRIMARY = os.getenv("LLM_PROVIDER", "mistral")
+    HEDGE = os.getenv("LLM_HEDGE", "auto")
+    # Costs ~(100 - percentile)% extra requests; only cuts the tail if slow answers are rarer than that
+    HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    # Hedge delay until MIN_SAMPLES answers of the primary are known, and the lower bound afterwards
+    HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "30"))
+    HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1"))
+    MIN_SAMPLES = 10
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, providers: List[LlmProvider], hedge: bool = False):
+        if not providers:
+            raise RuntimeError("LlmRouter needs at least one provider")
+        self.providers = providers
+        self.hedge = hedge and len(providers) > 1
+        self.hedged = 0       # requests that fired the second provider
+        self.hedge_wins = 0   # ... and were answered by it first
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def default(cls) -> "LlmRouter":
+        """Process-wide router configured from environment variables"""
+        with cls._default_lock:
+            if cls._default is None:
+                providers = {
+                    "mistral": LlmProvider("mistral", MistralClient.MistralClient,
+                                           MistralClient.MistralClient.extract_content),
+                    "gemini": LlmProvider("gemini", GeminiClient.GeminiClient,
+                                          GeminiClient.GeminiClient.extract_content),
+                }
+                if cls.PRIMARY not in providers:
+                    raise RuntimeError(f"Unknown LLM_PROVIDER: {cls.PRIMARY}. Available: {', '.join(providers)}")
+                ordered = [providers.pop(cls.PRIMARY), *providers.values()]
+                cls._default = cls(ordered, cls._hedge_enabled())
+            return cls._default
+
+    @staticmethod
+    def _hedge_enabled() -> bool:
+        if LlmRouter.HEDGE != "auto":
+            return LlmRouter.HEDGE == "1"
+        if not GeminiClient.GeminiClient.API_KEY or not os.getenv("MISTRAL_API_KEY"):
+            return False
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def complete(self, prompt: str) -> LlmReply:
+        # Whichever provider answered last time (a hedge may have been won by the second one)
+        # is replayed, so cached reruns stay instant and produce the same artifacts
+        for provider in self.providers:
+            cached = provider.cached(prompt)
+            if cached is not None:
+                return cached
+        primary = self.providers[0]
+        if not self.hedge:
+            return primary.call(prompt)
+        with Tracer.span("llm.hedge", "hedge", primary=primary.name) as span:
+            future = asyncio.run_coroutine_threadsafe(self._hedged(prompt, span), self._event_loop())
+            reply = future.result()
+            span.set(winner=reply.provider)
+            return reply
+
+    def hedge_delay(self) -> float:
+        primary = self.providers[0]
+        if primary.samples() < self.MIN_SAMPLES:
+            return self.HEDGE_DELAY
+        return max(self.HEDGE_MIN_DELAY, primary.percentile(self.HEDGE_PERCENTILE))
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "hedge": self.hedge,
+            "hedge_delay": round(self.hedge_delay(), 3),
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "providers": {provider.name: provider.stats() for provider in self.providers},
+        }
+
+    async def _hedged(self, prompt: str, span) -> LlmReply:
+        Tracer.adopt(span)
+        primary, secondary = self.providers[0], self.providers[1]
+        delay = self.hedge_delay()
+        started = time.perf_counter()
+        tasks = {asyncio.ensure_future(primary.acall(prompt)): primary}
+        errors = []
+        fired = False
+
+        while tasks:
+            timeout = None if fired else max(0.0, delay - (time.perf_counter() - started))
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                provider = tasks.pop(task)
+                try:
+                    reply = task.result()
+                except Exception as e:
+                    errors.append(f"{provider.name}: {e}")
+                    continue
+                for other in tasks:
+                    other.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                if fired and provider is secondary:
+                    with self._lock:
+                        self.hedge_wins += 1
+                span.set(hedged=fired, hedge_delay=round(delay, 3))
+                return reply
+            if not fired:
+                # The delay passed, or the primary failed early: ask the second provider too
+                fired = True
+                with self._lock:
+                    self.hedged += 1
+                tasks[asyncio.ensure_future(secondary.acall(prompt))] = secondary
+
+        raise RuntimeError(f"All LLM providers failed: {'; '.join(errors)}")
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-hedge", daemon=True).start()
+                self._loop = loop
+            return self._loop
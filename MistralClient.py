@@ -1,33 +1,257 @@
+import json
 import os
+from typing import Iterator, Optional
+
 import requests
 
+from AsyncHttpSession import AsyncHttpSession
+from HttpSession import HttpSession
+from RateLimiter import RateLimiter
+from ResponseCache import ResponseCache
+from Tracer import Tracer
+
 
 class MistralClient:
-    API_URL = "https://api.mistral.ai/v1/chat/completions"
+    # Overridable to point the pipeline at a local mock (benchmarks/MockLlmServer.py)
+    API_URL = os.getenv("MISTRAL_API_URL", "https://api.mistral.ai/v1/chat/completions")
+    MODEL = "mistral-small-latest"
+    TEMPERATURE = 0.2
+    SYSTEM_PROMPT = "You are a QA automation engineer. Return structured output."
+    # Off by default: enable only if the endpoint accepts Content-Encoding: gzip
+    GZIP_REQUESTS = os.getenv("MISTRAL_GZIP_REQUESTS", "0") == "1"
 
     @classmethod
     def call(cls, prompt: str) -> str:
-        api_key = os.getenv("MISTRAL_API_KEY") # Moved API_KEY retrieval here
-        if not api_key:
-            raise RuntimeError("MISTRAL_API_KEY not set")
+        with Tracer.span("mistral.call", "llm", model=cls.MODEL) as span:
+            # Identical requests are replayed from the on-disk cache (works without an API key)
+            cache = ResponseCache.default()
+            cache_key = cls._cache_key(prompt)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                span.set(cached=True, **cls._usage(cached))
+                return cached
+
+            headers = cls._headers()
+            try:
+                # 429/5xx are retried with backoff within the provider's rate limits
+                response = RateLimiter.for_provider("mistral").call(
+                    lambda: HttpSession.post_json(cls.API_URL, cls._payload(prompt), headers,
+                                                  compress=cls.GZIP_REQUESTS),
+                    prompt, lambda r: cls._total_tokens(r.text),
+                )
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise RuntimeError(f"Request failed: {e}")
+
+            # requests measures elapsed up to the parsed response headers
+            span.set(cached=False, ttfb=response.elapsed.total_seconds(),
+                     response_bytes=len(response.content), **cls._usage(response.text))
+            cache.put(cache_key, response.text, provider="mistral", model=cls.MODEL)
+            return response.text
+
+    @classmethod
+    async def acall(cls, prompt: str, timeout: Optional[float] = None) -> str:
+        """
+        Async counterpart of call(): many completions can be in flight from one
+        thread, bounded by AsyncHttpSession.MAX_CONCURRENCY.
+        """
+        # Not nested into the thread's span stack: other coroutines interleave on the same thread
+        span = Tracer.start("mistral.acall", "llm", model=cls.MODEL)
+        try:
+            cache = ResponseCache.default()
+            cache_key = cls._cache_key(prompt)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                span.set(cached=True, **cls._usage(cached))
+                return cached
+
+            headers = cls._headers()
+            reply = await RateLimiter.for_provider("mistral").acall(
+                lambda: AsyncHttpSession.post_json(cls.API_URL, cls._payload(prompt), headers,
+                                                   compress=cls.GZIP_REQUESTS),
+                prompt, lambda r: cls._total_tokens(r.text), timeout=timeout,
+            )
+            if reply.status >= 400:
+                raise RuntimeError(f"Request failed: {reply.status} for url: {cls.API_URL}")
+
+            span.set(cached=False, ttfb=reply.ttfb, response_bytes=len(reply.text.encode("utf-8")),
+                     **cls._usage(reply.text))
+            cache.put(cache_key, reply.text, provider="mistral", model=cls.MODEL)
+            return reply.text
+        finally:
+            span.finish()
+
+    @classmethod
+    def stream(cls, prompt: str) -> "CompletionStream":
+        """
+        Streamed (SSE) chat completion: iterate the result to receive content
+        deltas as they arrive. After iteration, raw_json holds a regular
+        (non-streamed) completion body, which is also what gets cached.
+        """
+        return CompletionStream(cls, prompt)
+
+    @staticmethod
+    def extract_content(raw_json: str) -> str:
+        """
+        Извлекает текст ассистента из ответа Mistral Chat Completions
+        (choices[].message.content; content может прийти списком чанков).
+        """
+        try:
+            data = json.loads(raw_json)
+            all_contents = []
+
+            for choice in data.get("choices", []):
+                message = choice.get("message", {})
+                content = message.get("content", "")
+                if isinstance(content, str):
+                    all_contents.append(content)
+                elif isinstance(content, list):
+                    # На случай, если content придёт как список чанков
+                    for part in content:
+                        if isinstance(part, dict):
+                            all_contents.append(
+                                part.get("text", "") or part.get("content", "")
+                            )
+
+            return "".join(all_contents)
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+            raise RuntimeError(
+                "Failed to extract assistant content from Mistral API response"
+            ) from e
+
+    @classmethod
+    def _cache_key(cls, prompt: str) -> str:
+        return ResponseCache.key("mistral", cls.MODEL, cls.TEMPERATURE, prompt, cls.SYSTEM_PROMPT)
 
-        payload = {
-            "model": "mistral-small-latest",
+    @staticmethod
+    def _usage(raw_json: str) -> dict:
+        """Token counts from the 'usage' field of a completion body (for the trace)"""
+        if not Tracer.ENABLED:
+            return {}
+        try:
+            usage = json.loads(raw_json).get("usage") or {}
+        except (ValueError, AttributeError):
+            return {}
+        return {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+        }
+
+    @staticmethod
+    def _total_tokens(raw_json: str) -> int:
+        """Tokens the provider counted for a completion (for the tokens-per-minute limit)"""
+        return (json.loads(raw_json).get("usage") or {}).get("total_tokens", 0)
+
+    @classmethod
+    def _payload(cls, prompt: str) -> dict:
+        return {
+            "model": cls.MODEL,
             "messages": [
-                {"role": "system", "content": "You are a QA automation engineer. Return structured output."},
+                {"role": "system", "content": cls.SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
-            "temperature": 0.2
+            "temperature": cls.TEMPERATURE
         }
 
-        headers = {
-            "Content-Type": "application/json",
+    @staticmethod
+    def _headers() -> dict:
+        api_key = os.getenv("MISTRAL_API_KEY") # Moved API_KEY retrieval here
+        if not api_key:
+            raise RuntimeError("MISTRAL_API_KEY not set")
+
+        return {
             "Authorization": f"Bearer {api_key}" # Use the dynamically fetched api_key
         }
 
+
+class CompletionStream:
+    """Content deltas of a streamed Mistral chat completion"""
+
+    def __init__(self, client: type, prompt: str):
+        self.client = client
+        self.prompt = prompt
+        self.raw_json: Optional[str] = None
+
+    def __iter__(self) -> Iterator[str]:
+        # Not nested into the thread's span stack: the consumer runs between deltas
+        span = Tracer.start("mistral.stream", "llm", model=self.client.MODEL)
+        try:
+            yield from self._deltas(span)
+        except BaseException as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.finish()
+
+    def _deltas(self, span) -> Iterator[str]:
+        cache = ResponseCache.default()
+        cache_key = self.client._cache_key(self.prompt)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            # Replay: the whole cached answer arrives as a single delta
+            self.raw_json = cached
+            span.set(cached=True, **self.client._usage(cached))
+            for choice in json.loads(cached).get("choices", []):
+                yield choice.get("message", {}).get("content", "")
+            return
+
+        payload = self.client._payload(self.prompt)
+        payload["stream"] = True
+        headers = self.client._headers()
         try:
-            response = requests.post(cls.API_URL, json=payload, headers=headers)
+            # Only the request is limited and retried: a stream cut off midway is not replayed
+            response = RateLimiter.for_provider("mistral").call(
+                lambda: HttpSession.post_json(self.client.API_URL, payload, headers,
+                                              compress=self.client.GZIP_REQUESTS, stream=True),
+                self.prompt,
+            )
             response.raise_for_status()
-            return response.text
         except requests.RequestException as e:
             raise RuntimeError(f"Request failed: {e}")
+        span.set(cached=False, ttfb=response.elapsed.total_seconds())
+
+        parts = []
+        last_event = {}
+        finish_reason = None
+        done = False
+        try:
+            for line in response.iter_lines(chunk_size=None):
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    done = True
+                    break
+                event = json.loads(data)
+                last_event = event
+                for choice in event.get("choices", []):
+                    finish_reason = choice.get("finish_reason") or finish_reason
+                    content = choice.get("delta", {}).get("content")
+                    if content:
+                        if not parts:
+                            span.set(first_token=span.seconds)
+                        parts.append(content)
+                        yield content
+        except (requests.RequestException, ValueError) as e:
+            raise RuntimeError(f"Streaming request failed: {e}")
+        finally:
+            response.close()
+        if not done and finish_reason is None:
+            # A connection closed midway: the partial answer must not be cached as a completion
+            raise RuntimeError("stream ended before completion")
+
+        completion = {
+            "id": last_event.get("id"),
+            "object": "chat.completion",
+            "model": last_event.get("model", self.client.MODEL),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(parts)},
+                "finish_reason": finish_reason,
+            }],
+        }
+        if "usage" in last_event:
+            completion["usage"] = last_event["usage"]
+        self.raw_json = json.dumps(completion, ensure_ascii=False)
+        span.set(**self.client._usage(self.raw_json))
+        cache.put(cache_key, self.raw_json, provider="mistral", model=self.client.MODEL)
@@ -0,0 +1,85 @@
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from PiiEngine import PiiEngine
+from PiiReport import PiiReport
+
+
+class PiiBatchScanner:
+    """Параллельное сканирование множества файлов на PII в пуле процессов"""
+
+    DEFAULT_PATTERN = "*.txt"
+
+    @classmethod
+    def scan(cls, target: str, pattern: str = DEFAULT_PATTERN, workers: Optional[int] = None,
+             chunksize: Optional[int] = None) -> PiiReport:
+        """
+        Сканирует каталог (рекурсивно, по маске pattern) или glob-шаблон
+        и возвращает общий отчет по всем файлам.
+        """
+        return cls.scan_files(cls.collect_files(target, pattern), workers, chunksize)
+
+    @staticmethod
+    def collect_files(target: str, pattern: str = DEFAULT_PATTERN) -> List[str]:
+        """Список файлов для сканирования в стабильном порядке"""
+        p = Path(target)
+        if p.is_dir():
+            return sorted(str(f) for f in p.rglob(pattern) if f.is_file())
+        return sorted(f for f in glob.glob(target, recursive=True) if os.path.isfile(f))
+
+    @classmethod
+    def scan_files(cls, paths: List[str], workers: Optional[int] = None,
+                   chunksize: Optional[int] = None) -> PiiReport:
+        """
+        Раздает файлы воркерам пачками по chunksize и сливает отчеты по файлам
+        в один. Порядок находок в общем отчете совпадает с порядком paths.
+        """
+        report = PiiReport()
+        if not paths:
+            return report
+
+        workers = workers or os.cpu_count() or 1
+        if chunksize is None:
+            # Несколько пачек на воркер: меньше IPC, но без простоя на хвосте
+            chunksize = max(1, len(paths) // (workers * 4))
+
+        if workers == 1:
+            results = map(cls._scan_file, paths)
+            for path, file_report in results:
+                report.merge(file_report, source=path)
+            return report
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for path, file_report in executor.map(cls._scan_file, paths, chunksize=chunksize):
+                report.merge(file_report, source=path)
+        return report
+
+    @staticmethod
+    def _scan_file(path: str) -> Tuple[str, PiiReport]:
+        """Сканирует один файл потоково, чтобы большие файлы не занимали память воркера"""
+        report = PiiReport()
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+                chunks = iter(lambda: f.read(PiiEngine.CHUNK_SIZE), "")
+                for finding in PiiEngine.stream(chunks):
+                    finding.source = path
+                    report.add_finding(finding)
+        except OSError as e:
+            raise RuntimeError(f"Cannot read file: {path}") from e
+        return path, report
+
+
+# python PiiBatchScanner.py <каталог|glob> [workers]
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python PiiBatchScanner.py <directory|glob> [workers]")
+        sys.exit(1)
+
+    batch_report = PiiBatchScanner.scan(sys.argv[1], workers=int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    print(f"PII Report: {len(batch_report.findings)} findings in {len(batch_report.sources)} files")
+    for pii_type, count in sorted(batch_report.counts.items()):
+        print(f"  {pii_type}: {count}")
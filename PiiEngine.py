@@ -0,0 +1,264 @@
+import io
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+from PiiPatterns import PiiPatterns
+from PiiReport import PiiReport, PiiFinding
+
+
+class PiiBudgetExceeded(RuntimeError):
+    """Сканирование документа не уложилось в отведенное время"""
+
+
+class PiiEngine:
+    """Однопроходный поиск и маскирование PII по общей таблице PiiPatterns"""
+
+    # Потоковый режим: размер порции и окно перекрытия для очень длинных строк
+    CHUNK_SIZE = 1 << 20
+    OVERLAP = 4096
+
+    # Лимит времени на документ (секунды) и размер порции, после которой он проверяется
+    DOCUMENT_BUDGET = float(os.getenv("PII_SCAN_BUDGET", "30"))
+    BUDGET_SLICE = 64 * 1024
+
+    @classmethod
+    def scan_and_mask(cls, text: str, budget: Optional[float] = None) -> Tuple[PiiReport, str]:
+        """
+        Проходит текст один раз и возвращает отчет со структурированными
+        находками (тип, start, end) и замаскированный текст.
+        Если задан budget (секунды), текст сканируется порциями и при
+        превышении лимита выбрасывается PiiBudgetExceeded.
+        """
+        if budget is not None:
+            return cls._scan_with_budget(text, budget, mask=True)
+
+        report = PiiReport()
+        parts = []
+        last = 0
+
+        for match in cls._iter_matches(text):
+            finding = cls._finding(match)
+            report.add_finding(finding)
+            parts.append(text[last:finding.start])
+            parts.append(cls._replacement(match, finding.type))
+            last = finding.end
+
+        parts.append(text[last:])
+        return report, "".join(parts)
+
+    @classmethod
+    def scan(cls, text: str, budget: Optional[float] = None) -> PiiReport:
+        """Только поиск PII, без построения замаскированного текста"""
+        if budget is not None:
+            return cls._scan_with_budget(text, budget, mask=False)[0]
+
+        report = PiiReport()
+        for match in cls._iter_matches(text):
+            report.add_finding(cls._finding(match))
+        return report
+
+    @classmethod
+    def mask(cls, text: str, budget: Optional[float] = None) -> str:
+        """Только маскирование PII за один проход"""
+        if budget is not None:
+            return cls._scan_with_budget(text, budget, mask=True)[1]
+
+        parts = []
+        last = 0
+        for match in cls._iter_matches(text):
+            parts.append(text[last:match.start()])
+            parts.append(cls._replacement(match, match.lastgroup))
+            last = match.end()
+        parts.append(text[last:])
+        return "".join(parts)
+
+    @classmethod
+    def stream(cls, chunks: Iterable[str], out: Optional[TextIO] = None, deadline: Optional[float] = None,
+               chunk_size: Optional[int] = None) -> Iterator[PiiFinding]:
+        """
+        Потоковое сканирование: читает текст порциями, пишет замаскированный
+        текст в out (если задан) и отдает находки по мере их появления.
+        Смещения находок - глобальные, от начала всего потока.
+
+        В памяти держится не больше CHUNK_SIZE + хвост. Хвост обычно -
+        незаконченная последняя строка (совпадения не пересекают перевод
+        строки); если строка длиннее OVERLAP, хвостом становится окно
+        перекрытия, а совпадение на границе окна переносится в следующую порцию.
+
+        deadline - момент time.monotonic(), после которого выбрасывается
+        PiiBudgetExceeded; проверяется после каждой порции.
+        """
+        chunk_size = chunk_size or cls.CHUNK_SIZE
+        pending = []
+        pending_size = 0
+        carry = ""
+        offset = 0
+
+        for chunk in chunks:
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size < chunk_size:
+                continue
+            cls._check_deadline(deadline, offset)
+
+            buffer = carry + "".join(pending)
+            pending = []
+            pending_size = 0
+            # carry начинается с одного уже обработанного символа - контекст для \b
+            head = 1 if offset else 0
+            cut, matches = cls._final_matches(buffer, head)
+            yield from cls._emit(buffer, head, cut, matches, offset - head, out)
+            offset += cut - head
+            carry = buffer[cut - 1:] if cut else buffer
+
+        cls._check_deadline(deadline, offset)
+        buffer = carry + "".join(pending)
+        head = 1 if offset else 0
+        matches = list(cls._iter_matches(buffer, head))
+        cls._check_deadline(deadline, offset)
+        yield from cls._emit(buffer, head, len(buffer), matches, offset - head, out)
+
+    @classmethod
+    def mask_file(cls, src_path: str, dst_path: str, findings_path: Optional[str] = None,
+                  chunk_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Маскирует файл любого размера с ограниченным потреблением памяти.
+        Находки (без значений) пишутся построчно в JSON Lines, если задан findings_path.
+        Возвращает количество находок по типам.
+        """
+        chunk_size = chunk_size or cls.CHUNK_SIZE
+        counts = defaultdict(int)
+
+        try:
+            with open(src_path, "r", encoding="utf-8", newline="") as src, \
+                    open(dst_path, "w", encoding="utf-8", newline="") as dst:
+                findings_file = open(findings_path, "w", encoding="utf-8") if findings_path else None
+                try:
+                    chunks = iter(lambda: src.read(chunk_size), "")
+                    for finding in cls.stream(chunks, dst):
+                        counts[finding.type] += 1
+                        if findings_file:
+                            findings_file.write(json.dumps(
+                                {"type": finding.type, "start": finding.start, "end": finding.end}
+                            ) + "\n")
+                finally:
+                    if findings_file:
+                        findings_file.close()
+        except OSError as e:
+            raise RuntimeError(f"Cannot mask file: {src_path}") from e
+
+        return dict(counts)
+
+    @classmethod
+    def _scan_with_budget(cls, text: str, budget: float, mask: bool) -> Tuple[PiiReport, str]:
+        """Сканирует текст порциями по BUDGET_SLICE, проверяя лимит времени между ними"""
+        deadline = time.monotonic() + budget
+        slices = (text[i:i + cls.BUDGET_SLICE] for i in range(0, len(text), cls.BUDGET_SLICE))
+        out = io.StringIO() if mask else None
+        report = PiiReport()
+        for finding in cls.stream(slices, out, deadline, cls.BUDGET_SLICE):
+            report.add_finding(finding)
+        return report, out.getvalue() if mask else text
+
+    @staticmethod
+    def _check_deadline(deadline: Optional[float], offset: int) -> None:
+        if deadline is not None and time.monotonic() > deadline:
+            raise PiiBudgetExceeded(f"PII scan exceeded its time budget after {offset} characters")
+
+    @classmethod
+    def _final_matches(cls, buffer: str, head: int) -> Tuple[int, list]:
+        """
+        Определяет границу cut, до которой совпадения в buffer уже не изменятся
+        от следующих порций, и возвращает их.
+        """
+        newline = buffer.rfind("\n", head)
+        if newline != -1 and len(buffer) - newline <= cls.OVERLAP:
+            cut = newline + 1
+            return cut, list(cls._iter_matches(buffer, head, cut))
+
+        # Очень длинная строка: финальны только совпадения, закончившиеся до окна перекрытия
+        limit = max(head, len(buffer) - cls.OVERLAP)
+        matches = []
+        for match in cls._iter_matches(buffer, head):
+            if match.end() <= limit:
+                matches.append(match)
+            elif match.start() < limit and match.end() - match.start() < cls.OVERLAP:
+                # Совпадение на границе может продолжиться в следующей порции
+                return match.start(), matches
+            elif match.start() < limit:
+                matches.append(match)
+                return match.end(), matches
+            else:
+                break
+        return limit, matches
+
+    @classmethod
+    def _emit(cls, buffer: str, head: int, cut: int, matches: list, base: int,
+              out: Optional[TextIO]) -> Iterator[PiiFinding]:
+        last = head
+        for match in matches:
+            if out is not None:
+                out.write(buffer[last:match.start()])
+                out.write(cls._replacement(match, match.lastgroup))
+            last = match.end()
+            yield PiiFinding(match.lastgroup, base + match.start(), base + match.end(), match.group())
+        if out is not None:
+            out.write(buffer[last:cut])
+
+    @staticmethod
+    def _iter_matches(text: str, pos: int = 0, endpos: Optional[int] = None) -> Iterator:
+        """
+        Литеральный префильтр: общий паттерн запускается только на строках,
+        где встречается TRIGGER. Совпадения не пересекают перевод строки,
+        поэтому результат тот же, что у COMBINED.finditer по всему тексту.
+        """
+        search = PiiPatterns.TRIGGER.search
+        finditer = PiiPatterns.COMBINED.finditer
+        length = len(text) if endpos is None else endpos
+
+        while True:
+            hit = search(text, pos, length)
+            if not hit:
+                return
+            line_start = text.rfind("\n", pos, hit.start()) + 1 or pos
+            line_end = text.find("\n", hit.end(), length)
+            if line_end == -1:
+                line_end = length
+            yield from finditer(text, line_start, line_end)
+            pos = line_end
+
+    @staticmethod
+    def _finding(match) -> PiiFinding:
+        return PiiFinding(match.lastgroup, match.start(), match.end(), match.group())
+
+    @staticmethod
+    def _replacement(match, pii_type: str) -> str:
+        replacement = PiiPatterns.REPLACEMENTS[pii_type]
+        if "\\" in replacement:
+            return match.expand(replacement)
+        return replacement
+
+
+# Пример использования и тест
+# python PiiEngine.py <input> <masked_output> [findings.jsonl] - потоковое маскирование файла
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) >= 3:
+        print(PiiEngine.mask_file(*sys.argv[1:4]))
+        sys.exit(0)
+
+    test_text = """
+    Key : HMGNV-WCYXV-X7G9W-YCX63-B98R2
+    borodicht@gmail.com
+    +7 (495) 123-45-67
+    password: secret123
+    pass = mypass456
+    """
+
+    report, masked = PiiEngine.scan_and_mask(test_text)
+    print(report)
+    print("\nMasked:", masked)
@@ -1,30 +1,25 @@
-import re
+from PiiEngine import PiiEngine
+from PiiPatterns import PiiPatterns
 
 
 class PiiMasker:
     """Маскирует PII (персональные данные) в тексте"""
 
-    # Те же регулярные выражения, что в оригинале Java
-    EMAIL_PATTERN = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
-    PHONE_PATTERN = r"\+?\d[\d\s\-()]{7,}"
-    PASSWORD_PATTERN = r"(?i)(password\s*[:=]\s*)\S+"
+    # Общая таблица паттернов с PiiScanner
+    EMAIL_PATTERN = PiiPatterns.EMAIL
+    PHONE_PATTERN = PiiPatterns.PHONE
+    PASSWORD_PATTERN = PiiPatterns.PASSWORD
 
     @staticmethod
     def mask(text: str) -> str:
         """
-        Маскирует PII в тексте:
+        Маскирует PII в тексте за один проход:
         - email → [EMAIL]
         - телефон → [PHONE]
         - password:xxx → password:[SECRET]
+        - ключ продукта → [PRODUCT_KEY]
         """
-        masked = text
-
-        # Заменяем по тому же порядку, что в Java
-        masked = re.sub(PiiMasker.EMAIL_PATTERN, "[EMAIL]", masked, flags=re.IGNORECASE)
-        masked = re.sub(PiiMasker.PHONE_PATTERN, "[PHONE]", masked)
-        masked = re.sub(PiiMasker.PASSWORD_PATTERN, r"\g<0>[SECRET]", masked, flags=re.IGNORECASE)
-
-        return masked
+        return PiiEngine.mask(text)
 
 
 # Пример использования и тест
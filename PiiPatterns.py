@@ -0,0 +1,64 @@
+import re
+from typing import List, Tuple
+
+
+class PiiPatterns:
+    """Единая таблица паттернов PII для PiiScanner, PiiMasker и PiiEngine"""
+
+    # Все квантификаторы ограничены, а где разбор однозначен - посессивны (*+, {m,n}+).
+    # Поэтому работа на одной стартовой позиции ограничена константой и сканирование
+    # линейно по длине текста: длинные последовательности цифр, пробелов, скобок
+    # или символов local-part не вызывают катастрофического бэктрекинга.
+
+    # local-part до 64 символов (RFC 5321), домен - до 8 меток и TLD
+    EMAIL = r"[a-zA-Z0-9._%+-]{1,64}+@(?:[a-zA-Z0-9-]{1,63}+\.){1,8}[a-zA-Z]{2,63}+"
+
+    PRODUCT_KEY = r"[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-?[A-Z0-9]{0,5}"
+
+    # Ключ (password: / pass = / pwd=) сохраняется при маскировании, значение заменяется
+    PASSWORD = (
+        r"(?P<PASSWORD_KEY>\b(?:password|passwd|pass|pwd)[ \t]{0,16}+[:=][ \t]{0,16}+)"
+        r"['\"]?[^\s'\"]{1,256}+['\"]?"
+    )
+
+    # Телефон: 8-16 цифр (E.164 - до 15), начинается и заканчивается цифрой,
+    # разделители не переходят на новую строку
+    PHONE = r"\+?\d(?:[ \t\-()]{0,3}+\d){7,15}"
+
+    # Верхняя граница длины любого совпадения (EMAIL: 64 + 1 + 8 * 64 + 63).
+    # Окно перекрытия PiiEngine.OVERLAP должно быть больше.
+    MAX_MATCH_LENGTH = 640
+
+    # Ни один паттерн не пересекает перевод строки: PiiEngine сканирует
+    # только строки, в которых есть TRIGGER, и это должно оставаться верным.
+    #
+    # (тип, паттерн, шаблон замены для match.expand).
+    # Порядок важен: при совпадении на одной позиции побеждает первый тип.
+    TABLE: List[Tuple[str, str, str]] = [
+        ("EMAIL", EMAIL, "[EMAIL]"),
+        ("PRODUCT_KEY", PRODUCT_KEY, "[PRODUCT_KEY]"),
+        ("PASSWORD", PASSWORD, r"\g<PASSWORD_KEY>[SECRET]"),
+        ("PHONE", PHONE, "[PHONE]"),
+    ]
+
+    FLAGS = re.IGNORECASE
+
+    # Один скомпилированный паттерн: каждая альтернатива - именованная группа с типом PII
+    COMBINED = re.compile(
+        "|".join(f"(?P<{pii_type}>{pattern})" for pii_type, pattern, _ in TABLE),
+        FLAGS
+    )
+
+    # Литерал, без которого не бывает ни одного совпадения: '@' (email),
+    # '-' (ключ продукта), цифра (телефон), pass/pwd (пароль)
+    TRIGGER = re.compile(r"[@\d-]|p(?:ass|wd)", FLAGS)
+
+    REPLACEMENTS = {pii_type: replacement for pii_type, _, replacement in TABLE}
+
+    @classmethod
+    def compiled(cls, pii_type: str) -> re.Pattern:
+        """Возвращает отдельно скомпилированный паттерн для одного типа PII"""
+        for name, pattern, _ in cls.TABLE:
+            if name == pii_type:
+                return re.compile(pattern, cls.FLAGS)
+        raise ValueError(f"Unknown PII type: {pii_type}")
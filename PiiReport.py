@@ -1,19 +1,35 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from typing import List, Dict, Any
 from collections import defaultdict
 
 
+@dataclass
+class PiiFinding:
+    """Одна находка PII: тип и позиция в исходном тексте"""
+    type: str
+    start: int
+    end: int
+    value: str
+    source: str = ""
+
+
 @dataclass
 class PiiReport:
     """Отчет о найденных PII (Personally Identifiable Information)"""
     findings: List[str] = None
     counts: Dict[str, int] = None
+    locations: List[PiiFinding] = None
+    sources: Dict[str, int] = None
 
     def __post_init__(self):
         if self.findings is None:
             self.findings = []
         if self.counts is None:
             self.counts = defaultdict(int)
+        if self.locations is None:
+            self.locations = []
+        if self.sources is None:
+            self.sources = {}
 
     def add(self, finding: str):
         """Добавляет найденное PII в отчет"""
@@ -21,12 +37,30 @@ class PiiReport:
         pii_type = finding.split(': ', 1)[0]
         self.counts[pii_type] += 1
 
+    def add_finding(self, finding: PiiFinding):
+        """Добавляет структурированную находку PII в отчет"""
+        self.locations.append(finding)
+        self.add(f"{finding.type}: {finding.value}")
+
+    def merge(self, other: "PiiReport", source: str = None):
+        """Добавляет находки другого отчета (например, отчета по одному файлу)"""
+        self.findings.extend(other.findings)
+        for pii_type, count in other.counts.items():
+            self.counts[pii_type] += count
+        self.locations.extend(other.locations)
+        for name, count in other.sources.items():
+            self.sources[name] = self.sources.get(name, 0) + count
+        if source is not None:
+            self.sources[source] = self.sources.get(source, 0) + len(other.findings)
+
     def to_dict(self) -> Dict[str, Any]:
         """Возвращает отчет в формате словаря"""
         return {
             'total_findings': len(self.findings),
             'findings_by_type': dict(self.counts),
-            'all_findings': self.findings
+            'all_findings': self.findings,
+            'locations': [asdict(f) for f in self.locations],
+            'findings_by_source': dict(self.sources)
         }
 
     def __str__(self) -> str:
@@ -1,63 +1,22 @@
-import re
-from typing import List, Dict, Any
-from collections import defaultdict
+from PiiEngine import PiiEngine
+from PiiPatterns import PiiPatterns
 from PiiReport import PiiReport
 
 
 class PiiScanner:
     """Сканер персональных данных (PII)"""
 
-    # Расширенные паттерны для поиска PII
-    EMAIL_PATTERN = re.compile(
-        r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}",
-        re.IGNORECASE
-    )
-
-    PHONE_PATTERN = re.compile(
-        r"\+?[\d\s\-()]{10,}",  # Улучшенный паттерн телефонов
-        re.IGNORECASE
-    )
-
-    PASSWORD_PATTERN = re.compile(
-        r"(?i)(password|pass|pwd)[\s:=]*['\"]?\S+['\"]?",
-        re.IGNORECASE
-    )
-
-    PRODUCT_KEY_PATTERN = re.compile(
-        r"[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-?[A-Z0-9]{0,5}",
-        re.IGNORECASE
-    )
+    # Паттерны берутся из общей таблицы PiiPatterns, чтобы отчет
+    # и маскирование (PiiMasker) всегда находили одно и то же
+    EMAIL_PATTERN = PiiPatterns.compiled("EMAIL")
+    PHONE_PATTERN = PiiPatterns.compiled("PHONE")
+    PASSWORD_PATTERN = PiiPatterns.compiled("PASSWORD")
+    PRODUCT_KEY_PATTERN = PiiPatterns.compiled("PRODUCT_KEY")
 
     @classmethod
     def scan(cls, text: str) -> PiiReport:
-        """Сканирует текст на наличие PII"""
-        report = PiiReport()
-
-        # Сканируем все типы PII
-        cls._find_all(text, report)
-
-        return report
-
-    @classmethod
-    def _find_all(cls, text: str, report: PiiReport):
-        """Находит все типы PII в тексте"""
-        patterns = [
-            (cls.EMAIL_PATTERN, "EMAIL"),
-            (cls.PHONE_PATTERN, "PHONE"),
-            (cls.PASSWORD_PATTERN, "PASSWORD"),
-            (cls.PRODUCT_KEY_PATTERN, "PRODUCT_KEY")
-        ]
-
-        for pattern, pii_type in patterns:
-            cls._find(text, pattern, pii_type, report)
-
-    @classmethod
-    def _find(cls, text: str, pattern: re.Pattern, pii_type: str,
-              report: PiiReport):
-        """Вспомогательный метод поиска совпадений"""
-        for match in pattern.finditer(text):
-            full_match = match.group()
-            report.add(f"{pii_type}: {full_match}")
+        """Сканирует текст на наличие PII за один проход"""
+        return PiiEngine.scan(text)
 
 
 # Пример использования и тест
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from FilesUtil import FilesUtil
+from Tracer import Tracer
+
+
+@dataclass
+class Stage:
+    """
+    Pipeline node: consumes named artifacts and returns a dict with its outputs.
+    sources are the other files the stage reads (checklist, prompt templates):
+    a change in them invalidates the stage checkpoint just like a changed input.
+    fingerprint hashes what the stage writes besides its artifacts (the
+    autotests directory): the checkpoint only matches while it is unchanged.
+    """
+    name: str
+    run: Callable[..., Dict[str, str]]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    sources: Tuple[str, ...] = ()
+    fingerprint: Optional[Callable[[], Dict[str, Optional[str]]]] = None
+
+
+@dataclass
+class StageTiming:
+    name: str
+    start: float
+    end: float
+    deps: List[str] = field(default_factory=list)
+    resumed: bool = False
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+
+class PipelineGraph:
+    """
+    Runs stages in dependency order. A stage starts as soon as all of its
+    inputs are available, so independent stages run concurrently on a thread
+    pool (stages are I/O bound: LLM calls and file writes).
+
+    Inputs that no selected stage produces are loaded from their artifact
+    files. This is how a single stage or a sub-graph is re-run on top of the
+    results of a previous run.
+
+    With a checkpoint directory every finished stage records the sha256 of
+    its inputs, sources and outputs there. run(resume=True) skips a stage
+    whose checkpoint still matches - same input and source hashes, output
+    artifact files and stage fingerprint unchanged - and loads its outputs from those files; the
+    first stage that does not match runs again, and so does everything
+    downstream whose inputs change as a result.
+    """
+
+    def __init__(self, stages: Iterable[Stage], artifacts: Dict[str, str], name: str = "pipeline",
+                 checkpoint_dir: Optional[str] = None):
+        self.name = name
+        self.checkpoint_dir = checkpoint_dir
+        self.stages: Dict[str, Stage] = {}
+        self.producers: Dict[str, str] = {}
+        self.artifacts = artifacts
+        for stage in stages:
+            if stage.name in self.stages:
+                raise RuntimeError(f"Duplicate stage: {stage.name}")
+            self.stages[stage.name] = stage
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise RuntimeError(f"Artifact '{output}' is produced by both "
+                                       f"'{self.producers[output]}' and '{stage.name}'")
+                self.producers[output] = stage.name
+        self.timings: Dict[str, StageTiming] = {}
+        self._check_acyclic()
+
+    def dependencies(self, name: str) -> List[str]:
+        """Names of the stages producing the inputs of the given stage"""
+        return [self.producers[i] for i in self.stages[name].inputs if i in self.producers]
+
+    def select(self, targets: Optional[Iterable[str]] = None, with_deps: bool = False) -> List[str]:
+        """Stage names to run: all stages, or the targets (plus everything upstream with with_deps)"""
+        if not targets:
+            return list(self.stages)
+        selected = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise RuntimeError(f"Unknown stage: {name}. Available: {', '.join(self.stages)}")
+            if name in selected:
+                continue
+            selected.add(name)
+            if with_deps:
+                pending.extend(self.dependencies(name))
+        return [name for name in self.stages if name in selected]
+
+    def run(self, targets: Optional[Iterable[str]] = None, with_deps: bool = False,
+            max_workers: int = 4, resume: bool = False) -> Dict[str, str]:
+        """Runs the selected stages and returns all artifacts known at the end"""
+        selected = self.select(targets, with_deps)
+        context: Dict[str, str] = {}
+        produced = {output for name in selected for output in self.stages[name].outputs}
+        for name in selected:
+            for artifact in self.stages[name].inputs:
+                if artifact not in produced and artifact not in context:
+                    context[artifact] = self._load(artifact)
+
+        remaining = {name: set(self.dependencies(name)) & set(selected) for name in selected}
+        self.timings = {}
+        origin = time.perf_counter()
+        # Stage spans nest under the caller's spans (the run, a service job) although they run in the pool
+        parents = Tracer.current()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            running = {}
+            while remaining or running:
+                for name in [n for n, deps in remaining.items() if not deps]:
+                    del remaining[name]
+                    running[pool.submit(self._run_attached, parents, self.stages[name], context, origin,
+                                        resume)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    # Re-raises the stage error; queued stages are not started
+                    outputs, timing = future.result()
+                    missing = set(self.stages[name].outputs) - set(outputs)
+                    if missing:
+                        raise RuntimeError(f"Stage '{name}' did not produce: {', '.join(sorted(missing))}")
+                    context.update(outputs)
+                    self.timings[name] = timing
+                    for deps in remaining.values():
+                        deps.discard(name)
+        return context
+
+    def critical_path(self) -> List[str]:
+        """Longest chain of dependent stages (by wall-clock time) of the last run"""
+        best: Dict[str, Tuple[float, List[str]]] = {}
+        for name in sorted(self.timings, key=lambda n: self.timings[n].end):
+            timing = self.timings[name]
+            chains = [best[d] for d in timing.deps if d in best]
+            total, path = max(chains, default=(0.0, []), key=lambda chain: chain[0])
+            best[name] = (total + timing.seconds, path + [name])
+        return max(best.values(), default=(0.0, []), key=lambda chain: chain[0])[1]
+
+    def report(self) -> str:
+        """Per-stage start/end offsets and durations of the last run, critical path marked with '*'"""
+        critical = set(self.critical_path())
+        lines = [f"{'stage':<20} {'start':>8} {'end':>8} {'seconds':>8}"]
+        for timing in sorted(self.timings.values(), key=lambda t: t.start):
+            mark = "*" if timing.name in critical else " "
+            resumed = "  (checkpoint)" if timing.resumed else ""
+            lines.append(f"{timing.name:<19}{mark} {timing.start:8.2f} {timing.end:8.2f} {timing.seconds:8.2f}"
+                         f"{resumed}")
+        if self.timings:
+            wall = max(t.end for t in self.timings.values()) - min(t.start for t in self.timings.values())
+            lines.append(f"wall clock {wall:.2f}s, critical path: {' -> '.join(self.critical_path())}")
+        return "\n".join(lines)
+
+    def _run_attached(self, parents: List, *args):
+        with Tracer.attached(parents):
+            return self._run_stage(*args)
+
+    def _run_stage(self, stage: Stage, context: Dict[str, str], origin: float, resume: bool = False):
+        start = time.perf_counter() - origin
+        inputs = {name: context[name] for name in stage.inputs}
+        checkpoint = self._checkpoint(stage, inputs) if self.checkpoint_dir else None
+        if resume and checkpoint is not None:
+            outputs = self._restore(stage, checkpoint)
+            if outputs is not None:
+                with Tracer.span(stage.name, "stage", graph=self.name, resumed=True):
+                    pass
+                print(f"Resume: stage '{stage.name}' is up to date, outputs loaded from its checkpoint")
+                end = time.perf_counter() - origin
+                return outputs, StageTiming(stage.name, start, end, self.dependencies(stage.name), resumed=True)
+
+        with Tracer.span(stage.name, "stage", graph=self.name):
+            outputs = stage.run(**inputs) or {}
+        if checkpoint is not None:
+            self._save_checkpoint(stage, checkpoint, outputs)
+        end = time.perf_counter() - origin
+        return outputs, StageTiming(stage.name, start, end, self.dependencies(stage.name))
+
+    def checkpoint_path(self, name: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{name}.json")
+
+    def _checkpoint(self, stage: Stage, inputs: Dict[str, str]) -> dict:
+        """Hashes the stage depends on: its inputs and source files (None for a missing file)"""
+        sources = {}
+        for path in stage.sources:
+            try:
+                sources[path] = _sha256(FilesUtil.read(path))
+            except RuntimeError:
+                sources[path] = None
+        return {"inputs": {name: _sha256(value) for name, value in inputs.items()}, "sources": sources}
+
+    def _restore(self, stage: Stage, checkpoint: dict) -> Optional[Dict[str, str]]:
+        """Stage outputs loaded from their artifact files, or None if the checkpoint does not match"""
+        path = self.checkpoint_path(stage.name)
+        if not os.path.exists(path):
+            print(f"Resume: stage '{stage.name}' has no checkpoint")
+            return None
+        try:
+            saved = json.loads(FilesUtil.read(path))
+        except (RuntimeError, ValueError):
+            print(f"Resume: checkpoint of '{stage.name}' is unreadable")
+            return None
+        for key in ("inputs", "sources"):
+            changed = sorted(name for name in set(saved.get(key, {})) | set(checkpoint[key])
+                             if saved.get(key, {}).get(name) != checkpoint[key].get(name))
+            if changed:
+                print(f"Resume: stage '{stage.name}' is stale, changed {key}: {', '.join(changed)}")
+                return None
+
+        outputs = {}
+        for name in stage.outputs:
+            artifact = self.artifacts.get(name)
+            try:
+                value = FilesUtil.read(artifact) if artifact else None
+            except RuntimeError:
+                value = None
+            if value is None or _sha256(value) != saved.get("outputs", {}).get(name):
+                print(f"Resume: stage '{stage.name}' is incomplete, output '{name}' is missing or modified")
+                return None
+            outputs[name] = value
+
+        if stage.fingerprint is not None and stage.fingerprint() != saved.get("files"):
+            print(f"Resume: stage '{stage.name}' is incomplete, the files it wrote are missing or modified")
+            return None
+        return outputs
+
+    def _save_checkpoint(self, stage: Stage, checkpoint: dict, outputs: Dict[str, str]) -> None:
+        saved = dict(checkpoint, stage=stage.name, finished_at=time.time(),
+                     outputs={name: _sha256(value) for name, value in outputs.items() if name in stage.outputs})
+        if stage.fingerprint is not None:
+            saved["files"] = stage.fingerprint()
+        FilesUtil.write_atomic(self.checkpoint_path(stage.name), json.dumps(saved, indent=2))
+
+    def _load(self, artifact: str) -> str:
+        path = self.artifacts.get(artifact)
+        if path is None:
+            raise RuntimeError(f"Artifact '{artifact}' has no producer and no file to load it from")
+        return FilesUtil.read(path)
+
+    def _check_acyclic(self) -> None:
+        state: Dict[str, int] = {}
+
+        def visit(name: str, trail: List[str]) -> None:
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise RuntimeError(f"Stage cycle: {' -> '.join(trail + [name])}")
+            state[name] = 1
+            for dep in self.dependencies(name):
+                visit(dep, trail + [name])
+            state[name] = 2
+
+        for name in self.stages:
+            visit(name, [])
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
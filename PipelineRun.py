@@ -0,0 +1,89 @@
+import os
+from collections import Counter
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Callable, List
+
+PROMPTS_DIR = "prompts"
+# A language is supported when the first stage has a prompt in it
+FIRST_PROMPT = "01_scenarios_from_checklist"
+
+
+@dataclass(frozen=True)
+class PipelineRun:
+    """
+    One pipeline run: the checklist, the prompt language and the directories
+    the run writes to. Runs of a batch get their own directories so they
+    never overwrite each other's artifacts.
+    """
+    name: str
+    checklist: str
+    language: str = ""
+    generated_dir: str = "generated"
+    autotests_dir: str = "autotests"
+
+    @staticmethod
+    def default() -> "PipelineRun":
+        """The classic single run writing to generated/ and autotests/"""
+        return PipelineRun("default", "checklist_submitForm.txt")
+
+    @staticmethod
+    def from_spec(spec: str, root: str = "runs") -> "PipelineRun":
+        """
+        Builds a batch run from 'checklist.txt' or 'checklist.txt:lang'.
+        Without an explicit language, a '_<lang>' suffix of the checklist name
+        selects the prompt set if one exists (checklist_submitForm_ru.txt -> ru).
+        Only a known language is split off, so 'C:\\runs\\checklist.txt' stays a path.
+        """
+        checklist, _, language = spec.rpartition(":")
+        if not checklist or not PipelineRun.has_language(language):
+            checklist, language = spec, ""
+        stem = Path(checklist).stem
+        if not language:
+            suffix = stem.rpartition("_")[2]
+            if suffix != stem and PipelineRun.has_language(suffix):
+                language = suffix
+        name = stem if not language or stem.endswith(f"_{language}") else f"{stem}_{language}"
+        return PipelineRun(
+            name=name,
+            checklist=checklist,
+            language=language,
+            generated_dir=f"{root}/{name}/generated",
+            autotests_dir=f"{root}/{name}/autotests",
+        )
+
+    @staticmethod
+    def from_specs(specs: List[str], root: str = "runs") -> List["PipelineRun"]:
+        """
+        from_spec for a whole batch. Runs whose names collide (a/x.txt and
+        b/x.txt, x_ru.txt and x.txt:ru) get the checklist directory and, if
+        that is not enough, their position in the batch as a name suffix.
+        """
+        runs = [PipelineRun.from_spec(spec, root) for spec in specs]
+
+        def distinct(names: List[str], label: Callable[[int], str]) -> List[str]:
+            counts = Counter(names)
+            return [f"{name}_{label(i)}" if counts[name] > 1 and label(i) else name for i, name in enumerate(names)]
+
+        names = distinct([run.name for run in runs], lambda i: Path(runs[i].checklist).parent.name)
+        names = distinct(names, lambda i: str(i + 1))
+        return [run if name == run.name else
+                replace(run, name=name, generated_dir=f"{root}/{name}/generated",
+                        autotests_dir=f"{root}/{name}/autotests")
+                for run, name in zip(runs, names)]
+
+    @staticmethod
+    def has_language(language: str) -> bool:
+        return language.isalnum() and os.path.isfile(f"{PROMPTS_DIR}/{FIRST_PROMPT}_{language}.txt")
+
+    def out(self, filename: str) -> str:
+        """Path of an artifact inside this run's generated directory"""
+        return f"{self.generated_dir}/{filename}"
+
+    def prompt(self, stem: str) -> str:
+        """Prompt template path in the run language, falling back to the default prompt"""
+        if self.language:
+            localized = f"{PROMPTS_DIR}/{stem}_{self.language}.txt"
+            if os.path.exists(localized):
+                return localized
+        return f"{PROMPTS_DIR}/{stem}.txt"
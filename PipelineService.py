@@ -0,0 +1,341 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+from FilesUtil import FilesUtil
+from HttpSession import HttpSession
+from LlmRouter import LlmRouter
+from PiiEngine import PiiEngine
+from PipelineGraph import PipelineGraph
+from PipelineRun import PROMPTS_DIR, PipelineRun
+from PiplineMain import PipelineMain
+from PromptTemplate import PromptTemplate
+from RateLimiter import RateLimiter
+from ResponseCache import ResponseCache
+from Tracer import Tracer
+
+
+@dataclass
+class Job:
+    id: str
+    run: PipelineRun
+    label: str = ""
+    status: str = "queued"  # queued -> running -> succeeded | failed
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+    graph: Optional[PipelineGraph] = None
+
+    @property
+    def queue_seconds(self) -> Optional[float]:
+        return None if self.started is None else self.started - self.submitted
+
+    @property
+    def run_seconds(self) -> Optional[float]:
+        return None if self.finished is None or self.started is None else self.finished - self.started
+
+    def to_dict(self) -> dict:
+        timings = list(self.graph.timings.values()) if self.graph is not None else []
+        return {
+            "id": self.id,
+            "label": self.label,
+            "status": self.status,
+            "language": self.run.language or "default",
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "queue_seconds": _round(self.queue_seconds),
+            "run_seconds": _round(self.run_seconds),
+            "error": self.error,
+            "stages": {t.name: {"seconds": round(t.seconds, 3), "resumed": t.resumed} for t in timings},
+            "artifacts": f"/jobs/{self.id}/artifacts",
+        }
+
+
+class PipelineService(ThreadingHTTPServer):
+    """
+    Long-running pipeline service: checklist jobs over local HTTP.
+
+    POST /jobs                      checklist text as the body (or JSON {"checklist", "language", "label"}),
+                                    ?language=ru; answers 202 with the job
+    GET  /jobs, /jobs/<id>          job status, queue and run time, stage timings
+    GET  /jobs/<id>/artifacts[/<path>]  list of the job files, or one file (generated/..., autotests/...)
+    GET  /metrics                   job counts, throughput, queue latency, caches, rate limits
+    GET  /health
+
+    Jobs run on a pool of WORKERS threads; every job gets its own directory
+    under ROOT. The process stays warm between jobs: prompt templates are
+    compiled once (PromptTemplate cache), PII patterns are compiled at
+    start-up, and the response cache, pooled HTTP connections, the LLM
+    router latency statistics and rate limiters are shared by all jobs.
+    """
+
+    HOST = os.getenv("PIPELINE_SERVICE_HOST", "127.0.0.1")
+    PORT = int(os.getenv("PIPELINE_SERVICE_PORT", "8090"))
+    WORKERS = int(os.getenv("PIPELINE_SERVICE_WORKERS", str(PipelineMain.BATCH_JOBS)))
+    ROOT = os.getenv("PIPELINE_SERVICE_DIR", "service")
+    MAX_CHECKLIST_BYTES = int(os.getenv("PIPELINE_SERVICE_MAX_BYTES", str(4 * 1024 * 1024)))
+    # Finished jobs kept in memory (their files stay on disk)
+    JOB_HISTORY = 1000
+    # Jobs behind the throughput and latency figures of /metrics
+    METRICS_WINDOW_SECONDS = 300.0
+    daemon_threads = True
+
+    def __init__(self, host: str = HOST, port: int = PORT, workers: int = WORKERS, root: str = ROOT):
+        super().__init__((host, port), ServiceHandler)
+        self.root = Path(root)
+        self.workers = workers
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.started = time.time()
+        # (finished at, queue seconds, run seconds, succeeded) of recent jobs
+        self.finished = deque(maxlen=self.JOB_HISTORY)
+        self.finished_count = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    @staticmethod
+    def warm_up() -> Dict[str, int]:
+        """Loads everything a job would otherwise initialise on first use"""
+        templates = [PromptTemplate.load(str(path)) for path in sorted(Path(PROMPTS_DIR).glob("*.txt"))]
+        # One scan compiles the PII patterns of every type
+        PiiEngine.scan_and_mask("warm-up: user@example.com +1 555 010 0000 4111 1111 1111 1111")
+        ResponseCache.default()
+        HttpSession.session()
+        LlmRouter.default()
+        return {"templates": len(templates)}
+
+    def submit(self, checklist: str, language: str = "", label: str = "") -> Job:
+        if not checklist.strip():
+            raise ValueError("empty checklist")
+        if language and not PipelineRun.has_language(language):
+            raise ValueError(f"no prompts for language '{language}'")
+        job_id = uuid.uuid4().hex[:12]
+        directory = self.root / "jobs" / job_id
+        checklist_path = directory / "checklist.txt"
+        FilesUtil.write(str(checklist_path), checklist)
+        run = PipelineRun(name=job_id, checklist=checklist_path.as_posix(), language=language,
+                          generated_dir=(directory / "generated").as_posix(),
+                          autotests_dir=(directory / "autotests").as_posix())
+        job = Job(job_id, run, label)
+        with self._lock:
+            self.jobs[job_id] = job
+            self._forget_old_jobs()
+        self._pool.submit(self._execute, job)
+        return job
+
+    def job(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def job_list(self, limit: int = 100) -> List[dict]:
+        with self._lock:
+            jobs = list(self.jobs.values())[-limit:]
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def artifacts(self, job: Job) -> List[dict]:
+        directory = self.root / "jobs" / job.id
+        return [{"path": path.relative_to(directory).as_posix(), "bytes": path.stat().st_size}
+                for path in sorted(directory.rglob("*")) if path.is_file()]
+
+    def artifact_path(self, job: Job, relative: str) -> Optional[Path]:
+        """File of the job directory, None if missing or outside of it"""
+        directory = (self.root / "jobs" / job.id).resolve()
+        path = (directory / relative).resolve()
+        if directory not in path.parents or not path.is_file():
+            return None
+        return path
+
+    def metrics(self) -> dict:
+        now = time.time()
+        with self._lock:
+            statuses = [job.status for job in self.jobs.values()]
+            recent = [entry for entry in self.finished if now - entry[0] <= self.METRICS_WINDOW_SECONDS]
+            total_finished = self.finished_count
+        uptime = now - self.started
+        window = min(self.METRICS_WINDOW_SECONDS, uptime) or 1.0
+        return {
+            "uptime_seconds": round(uptime, 1),
+            "workers": self.workers,
+            "jobs": {status: statuses.count(status) for status in ("queued", "running", "succeeded", "failed")},
+            "queue_depth": statuses.count("queued"),
+            "throughput": {
+                "window_seconds": round(window, 1),
+                "jobs_per_minute": round(len(recent) / window * 60, 2),
+                "succeeded_per_minute": round(sum(1 for entry in recent if entry[3]) / window * 60, 2),
+                "finished_since_start": total_finished,
+            },
+            "queue_seconds": _percentiles([entry[1] for entry in recent]),
+            "run_seconds": _percentiles([entry[2] for entry in recent]),
+            "response_cache": ResponseCache.default().stats(),
+            "rate_limits": RateLimiter.all_stats(),
+            "llm": LlmRouter.default().stats(),
+        }
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _execute(self, job: Job) -> None:
+        job.started = time.time()
+        job.status = "running"
+        root = None
+        try:
+            with Tracer.span(job.id, "job", label=job.label) as root:
+                job.graph = PipelineMain.graph(job.run)
+                PipelineMain.run_graph(job.graph, job.run)
+            job.status = "succeeded"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            print(f"Job {job.id} failed: {e}")
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                self.finished.append((job.finished, job.queue_seconds, job.run_seconds, job.status == "succeeded"))
+                self.finished_count += 1
+            if root is not None:
+                # The collector would otherwise grow with every job the service runs
+                spans = Tracer.take(root)
+                try:
+                    Tracer.write(job.run.generated_dir, spans, job=job.to_dict())
+                except OSError as e:
+                    print(f"Warning: cannot write the trace of job {job.id}: {e}")
+
+    def _forget_old_jobs(self) -> None:
+        while len(self.jobs) > self.JOB_HISTORY:
+            oldest = next((job_id for job_id, job in self.jobs.items()
+                           if job.status in ("succeeded", "failed")), None)
+            if oldest is None:
+                return
+            del self.jobs[oldest]
+
+    @classmethod
+    def serve(cls, port: int = PORT, workers: int = WORKERS) -> None:
+        started = time.perf_counter()
+        warm = cls.warm_up()
+        server = cls(port=port, workers=workers)
+        print(f"=== AI QA PIPELINE SERVICE on {server.base_url}: {workers} workers, "
+              f"{warm['templates']} prompt templates warm, started in {time.perf_counter() - started:.2f}s ===")
+        print(f"  curl --data-binary @checklist_submitForm.txt {server.base_url}/jobs")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        service: PipelineService = self.server  # type: ignore[assignment]
+        parts = [unquote(part) for part in urlparse(self.path).path.strip("/").split("/") if part]
+        if parts == ["health"]:
+            return self._send_json(200, {"status": "ok", "uptime_seconds": round(time.time() - service.started, 1)})
+        if parts == ["metrics"]:
+            return self._send_json(200, service.metrics())
+        if parts == ["jobs"]:
+            return self._send_json(200, {"jobs": service.job_list()})
+        if len(parts) >= 2 and parts[0] == "jobs":
+            job = service.job(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": f"unknown job {parts[1]}"})
+            if len(parts) == 2:
+                return self._send_json(200, job.to_dict())
+            if parts[2] == "artifacts" and len(parts) == 3:
+                return self._send_json(200, {"id": job.id, "status": job.status,
+                                             "artifacts": service.artifacts(job)})
+            if parts[2] == "artifacts":
+                path = service.artifact_path(job, "/".join(parts[3:]))
+                if path is None:
+                    return self._send_json(404, {"error": "no such artifact"})
+                content_type = "application/json" if path.suffix == ".json" else "text/plain; charset=utf-8"
+                return self._send(200, path.read_bytes(), content_type)
+        return self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        service: PipelineService = self.server  # type: ignore[assignment]
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body cannot be skipped without its length: drop the connection after the reply
+            self.close_connection = True
+            return self._send_json(400, {"error": "invalid Content-Length header"})
+        if length > service.MAX_CHECKLIST_BYTES:
+            self.close_connection = True
+            return self._send_json(413, {"error": f"checklist larger than {service.MAX_CHECKLIST_BYTES} bytes"})
+        body = self.rfile.read(length).decode("utf-8", errors="replace")
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+
+        fields = dict(query)
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                return self._send_json(400, {"error": "invalid JSON body"})
+            if not isinstance(payload, dict):
+                return self._send_json(400, {"error": "JSON body must be an object"})
+            fields.update(payload)
+        else:
+            fields["checklist"] = body
+        try:
+            job = service.submit(str(fields.get("checklist", "")), str(fields.get("language", "")),
+                                 str(fields.get("label", "")))
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+        return self._send_json(202, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(status, json.dumps(payload, ensure_ascii=False, indent=1).encode("utf-8"),
+                   "application/json", headers)
+
+    def _send(self, status: int, data: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+def _percentiles(values: List[float]) -> dict:
+    """Nearest-rank p50/p95/p99"""
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": None, "p95": None, "p99": None}
+    return {f"p{q}": round(ordered[max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))], 3)
+            for q in (50, 95, 99)}
+
+
+if __name__ == "__main__":
+    PipelineMain.main(["--serve", *sys.argv[1:]])
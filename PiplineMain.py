@@ -1,19 +1,52 @@
+import hashlib
 import json
 import os
+import sys
 
-import GeminiClient
 import JsonExtractor
 import MistralClient
-from PiiScanner import PiiScanner
-from PiiReport import PiiReport
-from PiiMasker import PiiMasker
+from PiiEngine import PiiEngine
+from PipelineGraph import PipelineGraph, Stage
+from PipelineRun import PipelineRun
+from AutotestMerger import AutotestMerger
+from AutotestParser import AutotestStreamParser
+from AutotestSync import AutotestSync
 from FilesUtil import FilesUtil
+from LlmRouter import LlmRouter
 from PromptEngine import PromptEngine
+from PromptTemplate import PromptTemplate
+from RateLimiter import RateLimiter
+from ResponseCache import ResponseCache
+from Tracer import Tracer
 import re
-from pathlib import Path
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
 
 
 class PipelineMain:
+    # Stream the stage 5 completion and write files as they arrive (LLM_STREAM=0 to disable)
+    STREAM_AUTOTESTS = os.getenv("LLM_STREAM", "1") == "1"
+    # Update the autotests directory in place, writing only changed files (AUTOTESTS_SYNC=0 to recreate it)
+    SYNC_AUTOTESTS = os.getenv("AUTOTESTS_SYNC", "1") == "1"
+    # Testcases per stage 5 request: larger suites are split into shards generated in parallel (0 - never split)
+    SHARD_SIZE = int(os.getenv("AUTOTESTS_SHARD_SIZE", "25"))
+    SHARD_WORKERS = int(os.getenv("AUTOTESTS_SHARD_WORKERS", "4"))
+    # Stage 6 reviews every generated file on its own, in parallel (REVIEW_PER_FILE=0 - one prompt for all code)
+    REVIEW_PER_FILE = os.getenv("REVIEW_PER_FILE", "1") == "1"
+    REVIEW_WORKERS = int(os.getenv("REVIEW_WORKERS", "4"))
+    # Files shorter than this are reviewed together with the other small files of their directory
+    REVIEW_GROUP_CHARS = int(os.getenv("REVIEW_GROUP_CHARS", "600"))
+    STRUCTURE_START_PATTERN = re.compile(r"Project Structure\n")
+    STRUCTURE_END_PATTERN = re.compile(r"\n\n\S")
+    TREE_PREFIX_PATTERN = re.compile(r"[│\s└├─]*")
+
+    # Stages that may run at the same time
+    STAGE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+    # Checklists processed at the same time in batch mode (global limit across all runs)
+    BATCH_JOBS = int(os.getenv("PIPELINE_BATCH_JOBS", "4"))
+
     @staticmethod
     def extract_assistant_content(raw_json: str) -> str:
         """
@@ -34,28 +67,7 @@ class PipelineMain:
           ...
         }
         """
-        try:
-            data = json.loads(raw_json)
-            all_contents = []
-
-            for choice in data.get("choices", []):
-                message = choice.get("message", {})
-                content = message.get("content", "")
-                if isinstance(content, str):
-                    all_contents.append(content)
-                elif isinstance(content, list):
-                    # На случай, если content придёт как список чанков
-                    for part in content:
-                        if isinstance(part, dict):
-                            all_contents.append(
-                                part.get("text", "") or part.get("content", "")
-                            )
-
-            return "".join(all_contents)
-        except (json.JSONDecodeError, KeyError, TypeError) as e:
-            raise RuntimeError(
-                "Failed to extract assistant content from Mistral API response"
-            ) from e
+        return MistralClient.MistralClient.extract_content(raw_json)
 
     @staticmethod
     def _extract_code_blocks(text: str) -> list[str]:
@@ -72,108 +84,129 @@ class PipelineMain:
         """
         Parses the 'Project Structure:' section from the LLM output to extract
         a list of file and directory paths.
-        Assumes an indented tree-like structure.
+        Assumes an indented tree-like structure (4 spaces per level); the
+        section ends at the first empty line followed by a non-indented line.
+        Single pass over the section lines; nothing outside it is copied.
         """
-        structure_start_match = re.search(r"Project Structure\n", text)
+        structure_start_match = PipelineMain.STRUCTURE_START_PATTERN.search(text)
         if not structure_start_match:
             print("Warning: 'Project Structure:' section not found in LLM output.")
             return []
 
-        structure_text = text[structure_start_match.end():]
-        # Find the end of the structure section, e.g., by another heading or separator
-        structure_end_match = re.search(r"\n\n\S+", structure_text)  # Finds next non-indented line
-        if structure_end_match:
-            structure_text = structure_text[:structure_end_match.start()]
+        structure_end_match = PipelineMain.STRUCTURE_END_PATTERN.search(text, structure_start_match.end())
+        end = structure_end_match.start() if structure_end_match else len(text)
+        lines = text[structure_start_match.end():end].strip().split('\n')
 
-        lines = structure_text.strip().split('\n')
         paths = []
         path_stack = []  # To keep track of current path depth
-
-        for i, line in enumerate(lines):
-            if not line.strip():
+        # The entry is known to be a directory only once the next line is seen
+        pending_name = None
+        pending_depth = 0
+
+        for line in lines + [""]:
+            stripped = line.strip()
+            depth = (len(line) - len(line.lstrip(' '))) // 4  # Assuming 4 spaces per indent level
+            if pending_name is not None:
+                if stripped and depth > pending_depth:
+                    path_stack.append(pending_name)
+                pending_name = None
+            if not stripped:
                 continue
 
-            leading_spaces = len(line) - len(line.lstrip(' '))
-            depth = leading_spaces // 4  # Assuming 4 spaces per indent level
-
-            clean_name = re.sub(r'^[│\s└├─]+', '', line.strip()).rstrip('/')
+            clean_name = stripped[PipelineMain.TREE_PREFIX_PATTERN.match(stripped).end():].rstrip('/')
             if not clean_name:
                 continue
 
-            while len(path_stack) > depth:
-                path_stack.pop()
-
-            current_path_parts = path_stack + [clean_name]
-            full_path = f"{root_dir}/{'/'.join(current_path_parts)}"
-            paths.append(full_path)
-
-            # Look ahead to determine if the current item is a directory
-            is_directory = False
-            if i + 1 < len(lines):
-                next_line = lines[i + 1]
-                if next_line.strip():
-                    next_line_leading_spaces = len(next_line) - len(next_line.lstrip(' '))
-                    next_line_depth = next_line_leading_spaces // 4
-                    if next_line_depth > depth:
-                        is_directory = True
-
-            if is_directory:
-                path_stack.append(clean_name)
+            del path_stack[depth:]
+            paths.append(f"{root_dir}/{'/'.join(path_stack + [clean_name])}")
+            pending_name, pending_depth = clean_name, depth
 
         return paths
 
     @staticmethod
     def _parse_file_contents(text: str, root_dir: str = "autotests") -> dict[str, str]:
-        file_contents = {}
-
-        # Находим начало секции "### Project Code"
-        file_contents_start_match = re.search(r"^### Project Code\n", text, re.MULTILINE)
-        if not file_contents_start_match:
-            print("Warning: '### Project Code' section not found in the description text. No files will be parsed.")
-            return file_contents
-
-        text_to_parse = text[file_contents_start_match.end():]
-        lines = text_to_parse.splitlines()
-
-        # Pattern for file headers: "autotests/path/to/file.py" at the start of a line
-        file_header_pattern = re.compile(r"^autotests\/([a-zA-Z0-9_\-.\/]+)") 
-        code_block_pattern = re.compile(r"```(?:[a-zA-Z0-9]+)?\n(.*?)\n```", re.DOTALL)
-
-        current_file_path = None
-        current_file_content_lines = []
-        is_in_code_block_mode = False # To handle content that is not in ``` ``` blocks
-
-        for line in lines:
-            header_match = file_header_pattern.match(line.strip())
-            
-            if header_match:
-                # If we were collecting content for a previous file, save it
-                if current_file_path:
-                    full_content = "\n".join(current_file_content_lines).strip()
-                    code_match = code_block_pattern.search(full_content)
-                    
-                    content_to_save = code_match.group(1).strip() if code_match else full_content
-                    file_contents[os.path.join(root_dir, current_file_path)] = content_to_save
-
-                # Start collecting content for the new file
-                file_path_raw = header_match.group(1).strip() # Capture without "autotests/" prefix
-                current_file_path = file_path_raw
-                current_file_content_lines = []
-                is_in_code_block_mode = False # Reset for new file
-            elif current_file_path:
-                # Only accumulate if we have a current file being processed
-                current_file_content_lines.append(line)
-
-        # Process the last file after the loop finishes
-        if current_file_path:
-            full_content = "\n".join(current_file_content_lines).strip()
-            code_match = code_block_pattern.search(full_content)
-            content_to_save = code_match.group(1).strip() if code_match else full_content
-            file_contents[os.path.join(root_dir, current_file_path)] = content_to_save
-        
-        return file_contents
+        """Files of the '### Project Code' section: {root_dir/path: content} (see AutotestStreamParser)"""
+        return AutotestStreamParser.parse(text, root_dir=root_dir)
+
+    @staticmethod
+    def _stream_autotests(prompt: str, root_dir: str, write=FilesUtil.write) -> tuple[str, dict[str, str]]:
+        """
+        Streams the stage 5 completion and writes every file to disk as soon as
+        it is complete. README.md is only collected: it is rewritten later with
+        the final project tree. Returns the raw completion JSON and the file map.
+        """
+        stream = MistralClient.MistralClient.stream(prompt)
+        parser = AutotestStreamParser(root_dir=root_dir)
+        readme_key = f"{root_dir}/README.md"
+        written = {}
+        started = time.perf_counter()
+
+        def save(completed):
+            for file_path, content in completed:
+                if not written:
+                    print(f"First file ready after {time.perf_counter() - started:.1f}s")
+                written[file_path] = content
+                if file_path != readme_key:
+                    write(file_path, content)
+                    print(f"Saved file: {file_path}")
+
+        for delta in stream:
+            save(parser.feed(delta))
+        save(parser.close())
+
+        return stream.raw_json, written
 
+    @staticmethod
+    def _shard_testcases(testcases: str, size: int) -> list[str]:
+        """
+        Splits the stage 4 JSON into documents of at most `size` testcases.
+        A suite that is small, not splittable (size 0) or not valid JSON stays one shard as is.
+        """
+        if size <= 0:
+            return [testcases]
+        try:
+            data = json.loads(testcases)
+        except ValueError:
+            return [testcases]
+        items = data.get("testcases") if isinstance(data, dict) else data
+        if not isinstance(items, list) or len(items) <= size:
+            return [testcases]
+        return [json.dumps({"testcases": items[start:start + size]}, ensure_ascii=False, indent=2)
+                for start in range(0, len(items), size)]
 
+    @staticmethod
+    def _generate_shards(run: PipelineRun, template: PromptTemplate, shards: list[str]) -> tuple[str, dict[str, str]]:
+        """
+        One stage 5 request per shard, at most SHARD_WORKERS at a time, so the
+        stage takes as long as the slowest shard. File maps are merged in shard
+        order (AutotestMerger); the stage output is the merged project as one
+        '### Project Code' text. Each shard keeps its own prompt and answer files.
+        """
+        print(f"Splitting {len(shards)} shards of up to {PipelineMain.SHARD_SIZE} testcases...")
+        parents = Tracer.current()
+
+        def generate(index: int, shard: str) -> tuple[str, dict[str, str]]:
+            with Tracer.attached(parents), Tracer.span(f"shard {index}", "shard", graph=run.name):
+                prompt = PromptEngine.fill(template, "autotests", TESTCASES=shard)
+                FilesUtil.write(run.out(f"autotests_prompt_{index}.txt"), prompt)
+                reply = LlmRouter.default().complete(prompt)
+                FilesUtil.write(run.out(f"autotests_raw_{index}.json"), reply.raw)
+                text = reply.text
+                FilesUtil.write(run.out(f"autotests_{index}.txt"), text)
+                files = PipelineMain._parse_file_contents(text, root_dir=run.autotests_dir)
+                print(f"Shard {index}/{len(shards)}: {len(files)} files")
+                return text, files
+
+        with ThreadPoolExecutor(max_workers=max(1, min(PipelineMain.SHARD_WORKERS, len(shards)))) as pool:
+            results = list(pool.map(generate, range(1, len(shards) + 1), shards))
+
+        files = AutotestMerger.merge([shard_files for _, shard_files in results])
+        print(f"Merged {sum(len(shard_files) for _, shard_files in results)} shard files into {len(files)} files")
+        sections = [f"autotests/{os.path.relpath(path, run.autotests_dir).replace(os.sep, '/')}\n```\n{content}\n```"
+                    for path, content in files.items()]
+        merged_text = "### Project Code\n\n" + "\n\n".join(sections) + "\n"
+        FilesUtil.write(run.out("autotests.txt"), merged_text)
+        return merged_text, files
 
     @staticmethod
     def _generate_tree_string(paths: list[str], root_dir: str) -> str:
@@ -202,85 +235,189 @@ class PipelineMain:
         tree_lines = build_string(tree)
         return f"{root_dir}/\n" + "\n".join(tree_lines)
 
+    # Files (inside the run generated directory) the stage artifacts are saved to,
+    # and loaded from when their stage is not part of the run
+    ARTIFACTS = {
+        "prompt": "final_prompt.txt",
+        "llm_prompt": "llm_prompt.txt",
+        "checklist_masked": "checklist_masked.txt",
+        "scenarios": "ai_output.txt",
+        "testcases": "testcases.json",
+        "autotests": "autotests.txt",
+        "review": "code_review.txt",
+        "bug_report": "bug_report.json",
+    }
+
     @staticmethod
-    def main() -> None:
-        print("=== AI QA PIPELINE STARTED ===")
+    def graph(run: PipelineRun) -> PipelineGraph:
+        """
+        The pipeline as a dependency graph. Stage 7 only needs the masked
+        checklist besides the stage 4-6 results, so its preparation runs
+        concurrently with the prompt PII scan and the LLM stages.
+        Stage checkpoints are kept in <generated>/checkpoints for --resume.
+        """
+        return PipelineGraph([
+            Stage("prompt", partial(PipelineMain._stage_prompt, run), (), ("prompt",),
+                  (run.checklist, run.prompt("01_scenarios_from_checklist"))),
+            Stage("pii", partial(PipelineMain._stage_pii, run), ("prompt",), ("llm_prompt",)),
+            Stage("checklist_pii", partial(PipelineMain._stage_checklist_pii, run), (), ("checklist_masked",),
+                  (run.checklist,)),
+            Stage("scenarios", partial(PipelineMain._stage_scenarios, run), ("llm_prompt",), ("scenarios",)),
+            Stage("testcases", partial(PipelineMain._stage_testcases, run), ("scenarios",), ("testcases",),
+                  (run.prompt("02_testcases_json"),)),
+            Stage("autotests", partial(PipelineMain._stage_autotests, run), ("testcases",), ("autotests",),
+                  (run.prompt("03_automation_tests"),), partial(AutotestSync.snapshot, run.autotests_dir)),
+            Stage("review", partial(PipelineMain._stage_review, run), ("autotests",), ("review",),
+                  (run.prompt("04_code_review"),)),
+            Stage("bug_report", partial(PipelineMain._stage_bug_report, run),
+                  ("checklist_masked", "testcases", "autotests", "review"), ("bug_report",),
+                  (run.prompt("05_bug_report"),)),
+        ], {name: run.out(filename) for name, filename in PipelineMain.ARTIFACTS.items()}, name=run.name,
+            checkpoint_dir=run.out("checkpoints"))
 
+    @staticmethod
+    def _stage_prompt(run: PipelineRun) -> dict[str, str]:
         # STAGE 1. BUILD PROMPT FROM CHECKLIST
         prompt = PromptEngine.build_prompt(
-            "prompts/01_scenarios_from_checklist.txt",
-            "checklist_submitForm.txt",
+            run.prompt("01_scenarios_from_checklist"),
+            run.checklist,
         )
-        FilesUtil.write("generated/final_prompt.txt", prompt)
+        FilesUtil.write(run.out("final_prompt.txt"), prompt)
+        return {"prompt": prompt}
 
-        # STAGE 2. PII SCAN & MASK
+    @staticmethod
+    def _stage_pii(run: PipelineRun, prompt: str) -> dict[str, str]:
+        # STAGE 2. PII SCAN & MASK (single pass: findings and masked text together)
         print("STAGE 2: Scanning for PII...")
-        report: PiiReport = PiiScanner.scan(prompt)
-        FilesUtil.write("generated/pii_report.txt", str(report))
+        report, masked_prompt = PiiEngine.scan_and_mask(prompt, budget=PiiEngine.DOCUMENT_BUDGET)
+        FilesUtil.write(run.out("pii_report.txt"), str(report))
         print(f"Found {len(report.findings)} PII items")
 
         final_prompt = prompt
 
         if report.findings:
             print("PII detected. Masking input.")
-            final_prompt = PiiMasker.mask(prompt)
-            FilesUtil.write("generated/prompt_masked.txt", final_prompt)
+            final_prompt = masked_prompt
+            FilesUtil.write(run.out("prompt_masked.txt"), final_prompt)
 
+        FilesUtil.write(run.out("llm_prompt.txt"), final_prompt)
+        return {"llm_prompt": final_prompt}
+
+    @staticmethod
+    def _stage_checklist_pii(run: PipelineRun) -> dict[str, str]:
+        # STAGE 7 PREP. The checklist goes into the bug report prompt as is, so it is masked too
+        report, masked_checklist = PiiEngine.scan_and_mask(
+            FilesUtil.read(run.checklist), budget=PiiEngine.DOCUMENT_BUDGET
+        )
+        if report.findings:
+            print(f"Checklist: masked {len(report.findings)} PII items for the bug report")
+        FilesUtil.write(run.out("checklist_masked.txt"), masked_checklist)
+        return {"checklist_masked": masked_checklist}
+
+    @staticmethod
+    def _stage_scenarios(run: PipelineRun, llm_prompt: str) -> dict[str, str]:
         # STAGE 3. GENERATE SCENARIOS
         print("STAGE 3: Generating scenarios via LLM...")
-        # raw_scenarios = GeminiClient.GeminiClient.call(final_prompt)
-        raw_scenarios = MistralClient.MistralClient.call(final_prompt)
-        FilesUtil.write("generated/scenarios_raw.json", raw_scenarios)
+        reply = LlmRouter.default().complete(PromptEngine.compact_prompt(llm_prompt, "scenarios"))
+        FilesUtil.write(run.out("scenarios_raw.json"), reply.raw)
 
-        scenarios = PipelineMain.extract_assistant_content(raw_scenarios)
-        FilesUtil.write("generated/ai_output.txt", scenarios)
+        scenarios = reply.text
+        FilesUtil.write(run.out("ai_output.txt"), scenarios)
+        return {"scenarios": scenarios}
 
+    @staticmethod
+    def _stage_testcases(run: PipelineRun, scenarios: str) -> dict[str, str]:
         # STAGE 4. GENERATE JSON TESTCASES
         print("STAGE 4: Generating JSON testcases...")
-        json_prompt = FilesUtil.read("prompts/02_testcases_json.txt").replace(
-            "{{SCENARIOS}}", scenarios
+        json_prompt = PromptEngine.fill(
+            PromptTemplate.load(run.prompt("02_testcases_json")), "testcases", SCENARIOS=scenarios
         )
-        FilesUtil.write("generated/testcases_prompt.txt", json_prompt)
+        FilesUtil.write(run.out("testcases_prompt.txt"), json_prompt)
 
-        # raw_json = GeminiClient.GeminiClient.call(json_prompt)
-        raw_json = MistralClient.MistralClient.call(json_prompt)
-        FilesUtil.write("generated/testcases_raw.json", raw_json)
+        reply = LlmRouter.default().complete(json_prompt)
+        FilesUtil.write(run.out("testcases_raw.json"), reply.raw)
 
-        llm_json_text = PipelineMain.extract_assistant_content(raw_json)
-        FilesUtil.write("generated/testcases_llm.txt", llm_json_text)
+        llm_json_text = reply.text
+        FilesUtil.write(run.out("testcases_llm.txt"), llm_json_text)
 
         pure_json = JsonExtractor.JsonExtractor.extract_json(llm_json_text)
-        FilesUtil.write("generated/testcases.json", pure_json)
+        FilesUtil.write(run.out("testcases.json"), pure_json)
 
-        print("Testcases generated: generated/testcases.json")
+        print(f"Testcases generated: {run.out('testcases.json')}")
+        return {"testcases": pure_json}
 
+    @staticmethod
+    def _stage_autotests(run: PipelineRun, testcases: str) -> dict[str, str]:
         # STAGE 5. GENERATE AUTOTESTS AND ADD TO PROJECT
         print("STAGE 5: Generating autotests via LLM...")
-        autotest_prompt = FilesUtil.read("prompts/03_automation_tests.txt").replace(
-            "{{TESTCASES}}", pure_json
-        )
-        FilesUtil.write("generated/autotests_prompt.txt", autotest_prompt)
+        template = PromptTemplate.load(run.prompt("03_automation_tests"))
+        shards = PipelineMain._shard_testcases(testcases, PipelineMain.SHARD_SIZE)
+
+        sync = AutotestSync(run.autotests_dir) if PipelineMain.SYNC_AUTOTESTS else None
+        try:
+            return PipelineMain._generate_autotests(run, template, shards, testcases, sync)
+        except BaseException:
+            if sync is not None:
+                # Files already written stay generated ones: the next run may update or remove them
+                sync.save()
+            raise
+
+    @staticmethod
+    def _generate_autotests(run: PipelineRun, template: PromptTemplate, shards: list[str], testcases: str,
+                            sync: Optional[AutotestSync]) -> dict[str, str]:
+        autotests_root = run.autotests_dir
+        streamed_files = {}
+        write = sync.write if sync is not None else FilesUtil.write
+
+        if len(shards) > 1:
+            autotests_llm_text, file_contents_map = PipelineMain._generate_shards(run, template, shards)
+            if sync is None:
+                FilesUtil.delete_dir_if_exists(autotests_root)
+            FilesUtil.create_dir_if_not_exists(autotests_root)
+            return PipelineMain._integrate_autotests(autotests_root, autotests_llm_text, file_contents_map,
+                                                     streamed_files, write, sync)
+
+        autotest_prompt = PromptEngine.fill(template, "autotests", TESTCASES=testcases)
+        FilesUtil.write(run.out("autotests_prompt.txt"), autotest_prompt)
 
-        raw_autotests = MistralClient.MistralClient.call(autotest_prompt)
-        FilesUtil.write("generated/autotests_raw.json", raw_autotests)
+        if PipelineMain.STREAM_AUTOTESTS:
+            # Recreate autotests project directory first: files are written while the completion streams in
+            if sync is None:
+                FilesUtil.delete_dir_if_exists(autotests_root)
+            FilesUtil.create_dir_if_not_exists(autotests_root)
+            raw_autotests, streamed_files = PipelineMain._stream_autotests(autotest_prompt, autotests_root, write)
+            autotests_llm_text = PipelineMain.extract_assistant_content(raw_autotests)
+        else:
+            reply = LlmRouter.default().complete(autotest_prompt)
+            raw_autotests, autotests_llm_text = reply.raw, reply.text
+        FilesUtil.write(run.out("autotests_raw.json"), raw_autotests)
 
-        autotests_llm_text = PipelineMain.extract_assistant_content(raw_autotests)
-        FilesUtil.write("generated/autotests.txt", autotests_llm_text)
+        FilesUtil.write(run.out("autotests.txt"), autotests_llm_text)
 
         print(f"--- Raw LLM Output (autotests.txt) ---\n{autotests_llm_text}\n--------------------------------------")
 
         # Integrate generated autotests into project structure
-        print("Integrating generated autotests into 'autotests' project structure...")
-
-        autotests_root = "autotests"
+        print(f"Integrating generated autotests into '{autotests_root}' project structure...")
+
+        if PipelineMain.STREAM_AUTOTESTS:
+            # Already parsed incrementally while streaming
+            file_contents_map = dict(streamed_files)
+        else:
+            # Recreate autotests project directory to ensure a clean state (sync removes stale files itself)
+            if sync is None:
+                FilesUtil.delete_dir_if_exists(autotests_root)
+            FilesUtil.create_dir_if_not_exists(autotests_root)
 
-        # Recreate autotests project directory to ensure a clean state
-        FilesUtil.delete_dir_if_exists(autotests_root)
-        FilesUtil.create_dir_if_not_exists(autotests_root)
+            # Parse file contents from LLM output. This is now the single source of truth.
+            file_contents_map = PipelineMain._parse_file_contents(autotests_llm_text, root_dir=autotests_root)
 
-        # Parse file contents from LLM output. This is now the single source of truth.
-        file_contents_map = PipelineMain._parse_file_contents(autotests_llm_text, root_dir=autotests_root)
+        return PipelineMain._integrate_autotests(autotests_root, autotests_llm_text, file_contents_map,
+                                                 streamed_files, write, sync)
 
+    @staticmethod
+    def _integrate_autotests(autotests_root: str, autotests_llm_text: str, file_contents_map: dict[str, str],
+                             streamed_files: dict[str, str], write, sync: Optional[AutotestSync]) -> dict[str, str]:
+        """Adds __init__.py files and the README tree, writes the files and returns the stage 5 output"""
         if not file_contents_map:
             print("Warning: No file contents were parsed from the LLM output. The 'autotests' directory will be empty.")
             # Ensure autotests directory is created even if no files are parsed
@@ -298,8 +435,10 @@ class PipelineMain:
         for d in sorted(list(all_dirs)):
             init_file_path = os.path.join(d, "__init__.py")
             if not os.path.exists(init_file_path):
-                FilesUtil.write(init_file_path, "")
+                write(init_file_path, "")
                 print(f"Created empty __init__.py in: {d}")
+            elif sync is not None:
+                sync.keep(init_file_path)
         # --- End __init__.py creation ---
 
         # Generate a clean project structure tree string and inject it into README.md
@@ -322,7 +461,8 @@ class PipelineMain:
                     re.DOTALL | re.IGNORECASE
                 )
 
-                replacement = r"\1" + f"```\n{clean_tree_str.replace('\\', '\\\\')}\n```"
+                escaped_tree_str = clean_tree_str.replace('\\', '\\\\')
+                replacement = r"\1" + f"```\n{escaped_tree_str}\n```"
                 new_readme_content, num_replacements = pattern.subn(replacement, readme_content)
 
                 if num_replacements > 0:
@@ -333,52 +473,282 @@ class PipelineMain:
 
         # Write all files. Parent directories are created automatically by FilesUtil.write.
         for file_path, content in file_contents_map.items():
-            FilesUtil.write(file_path, content)
+            if file_path != f"{autotests_root}/README.md" and streamed_files.get(file_path) == content:
+                continue  # written while streaming
+            write(file_path, content)
             print(f"Saved file: {file_path}")
 
-        print("Autotests generated and integrated into 'autotests' project.")
+        if sync is not None:
+            counts = sync.finish()
+            print(f"Autotests synced: {counts['added']} added, {counts['changed']} changed, "
+                  f"{counts['unchanged']} unchanged, {counts['removed']} removed")
+
+        print(f"Autotests generated and integrated into '{autotests_root}' project.")
+
+        return {"autotests": autotests_llm_text}
 
+    @staticmethod
+    def _stage_review(run: PipelineRun, autotests: str) -> dict[str, str]:
         # STAGE 6. AI CODE REVIEW
         print("STAGE 6: AI code review...")
-        generated_test = FilesUtil.read("generated/autotests.txt")
-        review_prompt = FilesUtil.read("prompts/04_code_review.txt").replace("{{CODE}}", generated_test)
-        FilesUtil.write("generated/code_review_prompt.txt", review_prompt)
+        template = PromptTemplate.load(run.prompt("04_code_review"))
+        if PipelineMain.REVIEW_PER_FILE:
+            files = PipelineMain._parse_file_contents(autotests, root_dir="autotests")
+            if files:
+                return PipelineMain._review_files(run, template, files)
+        review_prompt = PromptEngine.fill(template, "review", CODE=autotests)
+        FilesUtil.write(run.out("code_review_prompt.txt"), review_prompt)
+
+        reply = LlmRouter.default().complete(review_prompt)
+        FilesUtil.write(run.out("code_review_raw.json"), reply.raw)
+
+        review = reply.text
+        FilesUtil.write(run.out("code_review.txt"), review)
 
-        raw_review = MistralClient.MistralClient.call(review_prompt)
-        FilesUtil.write("generated/code_review_raw.json", raw_review)
+        print(f"AI code review saved: {run.out('code_review.txt')}")
+        return {"review": review}
+
+    @staticmethod
+    def _review_units(files: dict[str, str]) -> list[tuple[str, str]]:
+        """
+        (title, code) of every review request: one per file, while files shorter
+        than REVIEW_GROUP_CHARS are reviewed together per directory. Empty files
+        are skipped. Units are sorted by path, so the same files give the same prompts.
+        """
+        units = []
+        small: dict[str, list[str]] = {}
+        for path in sorted(files):
+            content = files[path]
+            if not content.strip():
+                continue
+            if len(content) < PipelineMain.REVIEW_GROUP_CHARS:
+                small.setdefault(os.path.dirname(path), []).append(path)
+            else:
+                units.append((path, [path]))
+        units.extend((", ".join(paths), paths) for paths in small.values())
+        units.sort(key=lambda unit: unit[1][0])
+        return [(title, "\n\n".join(f"{path}\n```\n{files[path]}\n```" for path in paths))
+                for title, paths in units]
 
-        review = PipelineMain.extract_assistant_content(raw_review)
-        FilesUtil.write("generated/code_review.txt", review)
+    @staticmethod
+    def _review_files(run: PipelineRun, template: PromptTemplate, files: dict[str, str]) -> dict[str, str]:
+        """
+        Reviews the files of stage 5 concurrently and merges the results into
+        code_review.txt. Reviews are kept in code_review_cache.json by the sha256
+        of their prompt: a file that did not change (with the same template) is
+        not sent to the LLM again.
+        """
+        cache_path = run.out("code_review_cache.json")
+        try:
+            cache = json.loads(FilesUtil.read(cache_path)) if os.path.exists(cache_path) else {}
+        except (RuntimeError, ValueError):
+            cache = {}
+
+        units = PipelineMain._review_units(files)
+        prompts = [PromptEngine.fill(template, "review", CODE=code) for _, code in units]
+        keys = [hashlib.sha256(prompt.encode("utf-8")).hexdigest() for prompt in prompts]
+        pending = [index for index, key in enumerate(keys) if key not in cache]
+        print(f"Reviewing {len(units)} files/groups: {len(units) - len(pending)} unchanged (cached), "
+              f"{len(pending)} sent to the LLM")
+        # Every prompt, cached or not: a replayed run leaves the same artifacts as a cold one
+        FilesUtil.write(run.out("code_review_prompt.txt"),
+                        "\n\n".join(f"=== {title} ===\n{prompt}" for (title, _), prompt in zip(units, prompts)))
+        parents = Tracer.current()
+
+        def review(index: int) -> str:
+            with Tracer.attached(parents), Tracer.span(units[index][0], "review", graph=run.name):
+                return LlmRouter.default().complete(prompts[index]).text
 
-        print("AI code review saved: generated/code_review.txt")
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(PipelineMain.REVIEW_WORKERS, len(pending)))) as pool:
+                futures = {index: pool.submit(review, index) for index in pending}
+                for index, future in futures.items():
+                    cache[keys[index]] = future.result()
+        finally:
+            # Only the reviews of the current files are kept; finished ones survive a failed run
+            FilesUtil.write_atomic(cache_path, json.dumps({key: cache[key] for key in keys if key in cache},
+                                                          ensure_ascii=False, indent=1))
+        review = "\n\n".join(f"### {title}\n{cache[key].strip()}" for (title, _), key in zip(units, keys))
+        FilesUtil.write(run.out("code_review.txt"), review)
+
+        print(f"AI code review saved: {run.out('code_review.txt')}")
+        return {"review": review}
 
+    @staticmethod
+    def _stage_bug_report(run: PipelineRun, checklist_masked: str, testcases: str, autotests: str,
+                          review: str) -> dict[str, str]:
         # STAGE 7. AI BUG REPORT (DESIGN-TIME)
         print("STAGE 7: Generating AI bug report...")
-        checklist = FilesUtil.read("checklist_submitForm.txt")
-        testcases = FilesUtil.read("generated/testcases.json")
-        code_review = FilesUtil.read("generated/code_review.txt")
-
-        bug_prompt = (
-            FilesUtil.read("prompts/05_bug_report.txt")
-            .replace("{{CHECKLIST}}", checklist)
-            .replace("{{TESTCASES}}", testcases)
-            .replace("{{REVIEW}}", code_review)
+        bug_prompt = PromptEngine.fill(
+            PromptTemplate.load(run.prompt("05_bug_report")), "bug_report",
+            CHECKLIST=checklist_masked, TESTCASES=testcases, TESTS=autotests, REVIEW=review,
         )
 
-        FilesUtil.write("generated/bug_report_prompt.txt", bug_prompt)
+        FilesUtil.write(run.out("bug_report_prompt.txt"), bug_prompt)
 
-        raw_bug = MistralClient.MistralClient.call(bug_prompt)
-        FilesUtil.write("generated/bug_report_raw.json", raw_bug)
+        reply = LlmRouter.default().complete(bug_prompt)
+        FilesUtil.write(run.out("bug_report_raw.json"), reply.raw)
 
-        bug_text = PipelineMain.extract_assistant_content(raw_bug)
-        FilesUtil.write("generated/bug_report_llm.txt", bug_text)
+        bug_text = reply.text
+        FilesUtil.write(run.out("bug_report_llm.txt"), bug_text)
 
-        pure_bug_json = JsonExtractor.JsonExtractor.extract_json(bug_text)
-        FilesUtil.write("generated/bug_report.json", pure_bug_json)
+        bug_objects = [value for value in JsonExtractor.JsonExtractor.extract_all(bug_text) if isinstance(value, dict)]
+        if len(bug_objects) > 1:
+            # Several separate bug reports: keep all of them as one JSON array
+            pure_bug_json = json.dumps(bug_objects, ensure_ascii=False, indent=2)
+        else:
+            pure_bug_json = JsonExtractor.JsonExtractor.extract_json(bug_text)
+        FilesUtil.write(run.out("bug_report.json"), pure_bug_json)
+
+        print(f"Bug report saved: {run.out('bug_report.json')}")
+        return {"bug_report": pure_bug_json}
+
+    @staticmethod
+    def run_batch(runs: list[PipelineRun], jobs: int,
+                  resume: bool = False) -> list[tuple[PipelineRun, float, Optional[Exception]]]:
+        """
+        Runs whole pipelines for several checklists, at most `jobs` at a time.
+        A failed run does not stop the others; with resume a retried batch
+        continues every run from its first stage without a valid checkpoint.
+        Returns (run, seconds, error) per run.
+        """
+        PipelineMain._check_distinct(runs)
 
-        print("Bug report saved: generated/bug_report.json")
+        def execute(run: PipelineRun) -> tuple[PipelineRun, float, Optional[Exception]]:
+            started = time.perf_counter()
+            try:
+                PipelineMain.run_graph(PipelineMain.graph(run), run, resume=resume)
+                return run, time.perf_counter() - started, None
+            except Exception as e:
+                print(f"Run '{run.name}' failed: {e}")
+                return run, time.perf_counter() - started, e
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(execute, runs))
+
+    @staticmethod
+    def _check_distinct(runs: list[PipelineRun]) -> None:
+        names = [run.name for run in runs]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise RuntimeError(f"Batch runs share an output namespace: {', '.join(duplicates)}")
+
+    @staticmethod
+    def run_graph(graph: PipelineGraph, run: PipelineRun, targets: Optional[list[str]] = None,
+                  with_deps: bool = False, resume: bool = False) -> None:
+        with Tracer.span(run.name, "run", checklist=run.checklist, language=run.language or "default") as span:
+            graph.run(targets, with_deps=with_deps, max_workers=PipelineMain.STAGE_WORKERS, resume=resume)
+            span.set(critical_path=graph.critical_path())
+
+    @staticmethod
+    def main(argv: Optional[list[str]] = None) -> None:
+        """
+        python PiplineMain.py                       - whole pipeline
+        python PiplineMain.py review bug_report     - only these stages, inputs loaded from generated/
+        python PiplineMain.py autotests --deps      - a stage together with everything upstream
+        python PiplineMain.py --list                - stages with their inputs and outputs
+        python PiplineMain.py --resume              - skip stages whose checkpoint is still valid,
+                                                      continue from the first stale or unfinished one
+        python PiplineMain.py --batch a.txt b_ru.txt c.txt:ru [--jobs=N] [--resume]
+                                                    - one full run per checklist, written to runs/<name>/
+        python PiplineMain.py --serve [--port=8090] [--jobs=N]
+                                                    - long-running HTTP service accepting checklist jobs
+                                                      (see PipelineService)
+        """
+        args = sys.argv[1:] if argv is None else argv
+        positional = [arg for arg in args if not arg.startswith("--")]
+        resume = "--resume" in args
+        if "--serve" in args:
+            # Imported here: the service module builds on PipelineMain
+            from PipelineService import PipelineService
+            PipelineService.serve(PipelineMain._option(args, "--port", PipelineService.PORT),
+                                  PipelineMain._option(args, "--jobs", PipelineService.WORKERS))
+            return
+        if "--batch" in args:
+            PipelineMain.main_batch(positional, PipelineMain._option(args, "--jobs", PipelineMain.BATCH_JOBS),
+                                    resume)
+            return
+
+        run = PipelineRun.default()
+        graph = PipelineMain.graph(run)
+        if "--list" in args:
+            for stage in graph.stages.values():
+                print(f"{stage.name:<15} {', '.join(stage.inputs) or '-':<40} -> {', '.join(stage.outputs)}")
+            return
+
+        print("=== AI QA PIPELINE STARTED ===")
+        Tracer.reset()
+        try:
+            PipelineMain.run_graph(graph, run, positional, with_deps="--deps" in args, resume=resume)
+        finally:
+            PipelineMain._write_trace(run.generated_dir)
+
+        print("--- Stage timings (* = critical path) ---")
+        print(graph.report())
+        PipelineMain._print_cache_stats()
         print("=== AI QA PIPELINE FINISHED ===")
 
+    @staticmethod
+    def main_batch(specs: list[str], jobs: int, resume: bool = False) -> None:
+        if not specs:
+            raise RuntimeError("--batch needs at least one checklist")
+        runs = PipelineRun.from_specs(specs)
+        PipelineMain._check_distinct(runs)
+        print(f"=== AI QA PIPELINE BATCH STARTED: {len(runs)} checklists, {jobs} at a time ===")
+        Tracer.reset()
+        started = time.perf_counter()
+        results = PipelineMain.run_batch(runs, jobs, resume)
+        wall = time.perf_counter() - started
+        PipelineMain._write_trace("runs")
+
+        print("--- Batch results ---")
+        for run, seconds, error in results:
+            status = "ok" if error is None else f"FAILED: {error}"
+            print(f"{run.name:<30} {run.language or 'default':<8} {seconds:8.2f}s  {status}  -> {run.generated_dir}")
+        succeeded = sum(1 for _, _, error in results if error is None)
+        busy = sum(seconds for _, seconds, _ in results)
+        print(f"{succeeded}/{len(results)} runs succeeded in {wall:.2f}s: "
+              f"{len(results) / wall * 60:.1f} checklists/min, "
+              f"average concurrency {busy / wall:.1f}")
+        PipelineMain._print_cache_stats()
+        print("=== AI QA PIPELINE BATCH FINISHED ===")
+        if succeeded < len(results):
+            sys.exit(1)
+
+    @staticmethod
+    def _option(args: list[str], name: str, default: int) -> int:
+        for arg in args:
+            if arg.startswith(f"{name}="):
+                return int(arg.split("=", 1)[1])
+        return default
+
+    @staticmethod
+    def _write_trace(directory: str) -> None:
+        """trace_summary.json (machine-readable numbers) and trace.json (Chrome trace) of this run"""
+        if not Tracer.ENABLED:
+            return
+        Tracer.write(directory, llm=LlmRouter.default().stats(), rate_limits=RateLimiter.all_stats())
+        totals = Tracer.summary()["totals"]
+        print(f"Trace: {directory}/trace_summary.json, {directory}/trace.json "
+              f"({totals['llm_calls']} LLM calls, {totals['prompt_tokens']} prompt + "
+              f"{totals['completion_tokens']} completion tokens, "
+              f"{totals['bytes_read']} bytes read, {totals['bytes_written']} bytes written)")
+
+    @staticmethod
+    def _print_cache_stats() -> None:
+        cache_stats = ResponseCache.default().stats()
+        print(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['evictions']} evictions")
+        for name, stats in RateLimiter.all_stats().items():
+            if stats["retries"] or stats["waited_seconds"]:
+                print(f"LLM rate limits ({name}): {stats['requests']} requests, {stats['throttled']} throttled (429), "
+                      f"{stats['errors']} errors, {stats['retries']} retries, {stats['waited_seconds']:.1f}s waited, "
+                      f"concurrency limit {stats['concurrency_limit']:g}")
+        router = LlmRouter.default()
+        if router.hedge:
+            print(f"LLM hedging: {router.hedged} hedged requests, {router.hedge_wins} answered by "
+                  f"{router.providers[1].name} first (hedge delay {router.hedge_delay():.1f}s)")
+
 
 if __name__ == "__main__":
     PipelineMain.main()
@@ -1,9 +1,133 @@
+import json
+import os
+import re
+from typing import Optional
+
 from FilesUtil import FilesUtil
+from PromptTemplate import PromptTemplate
+from Tracer import Tracer
 
 
 class PromptEngine:
+    # Compaction of the values pasted into prompts (PROMPT_COMPACT=0 sends them verbatim)
+    COMPACT = os.getenv("PROMPT_COMPACT", "1") == "1"
+    # Estimated token budget of the whole prompt per stage, PROMPT_BUDGET_<STAGE> to override
+    BUDGETS = {
+        stage: int(os.getenv(f"PROMPT_BUDGET_{stage.upper()}", str(default)))
+        for stage, default in {
+            "scenarios": 16000,
+            "testcases": 16000,
+            "autotests": 24000,
+            "review": 32000,
+            "bug_report": 32000,
+        }.items()
+    }
+    TRAILING_SPACE_PATTERN = re.compile(r"[ \t]+$", re.MULTILINE)
+    BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+    TRUNCATION_MARKER = "\n[... {count} characters omitted to fit the prompt budget ...]\n"
+
     @staticmethod
     def build_prompt(prompt_template_path: str, checklist_path: str) -> str:
-        template = FilesUtil.read(prompt_template_path)
-        checklist = FilesUtil.read(checklist_path)
-        return template.replace("{{CHECKLIST}}", checklist)
+        return PromptTemplate.load(prompt_template_path).render(CHECKLIST=FilesUtil.read(checklist_path))
+
+    @staticmethod
+    def fill(template: PromptTemplate, stage: str, **values: str) -> str:
+        """
+        Renders the template with the given values, compacted and trimmed so
+        that the prompt fits the stage budget. The template text itself is
+        never trimmed: when the prompt is too long the largest values are cut
+        first. Missing or unknown placeholders raise (see PromptTemplate).
+        """
+        template.check(values)
+        if not PromptEngine.COMPACT:
+            return template.render(**values)
+
+        literal_tokens = PromptEngine.estimate_tokens(template.text)
+        before = literal_tokens + sum(
+            PromptEngine.estimate_tokens(value) * template.count(name) for name, value in values.items()
+        )
+        values = {name: PromptEngine.compact(value) for name, value in values.items()}
+        tokens = {name: PromptEngine.estimate_tokens(value) * template.count(name) for name, value in values.items()}
+        excess = literal_tokens + sum(tokens.values()) - PromptEngine.budget(stage)
+        for name in sorted(tokens, key=tokens.get, reverse=True):
+            if excess <= 0 or not tokens[name]:
+                break
+            cut = min(excess, tokens[name])
+            values[name] = PromptEngine.truncate(values[name], (tokens[name] - cut) // template.count(name))
+            excess -= cut
+
+        prompt = template.render(**values)
+        PromptEngine._log(stage, before, prompt)
+        return prompt
+
+    @staticmethod
+    def compact_prompt(prompt: str, stage: str) -> str:
+        """Compaction of a ready prompt (no placeholders left): whitespace, then the budget"""
+        if not PromptEngine.COMPACT:
+            return prompt
+        before = PromptEngine.estimate_tokens(prompt)
+        compacted = PromptEngine.truncate(PromptEngine.collapse_whitespace(prompt), PromptEngine.budget(stage))
+        PromptEngine._log(stage, before, compacted)
+        return compacted
+
+    @staticmethod
+    def budget(stage: str) -> int:
+        return PromptEngine.BUDGETS.get(stage, max(PromptEngine.BUDGETS.values()))
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """
+        Rough token count without a tokenizer: ~4 characters per token for
+        Latin text and code, ~2 for Cyrillic and other multi-byte characters
+        (each of them adds one extra UTF-8 byte or more).
+        """
+        extra_bytes = len(text.encode("utf-8")) - len(text)
+        return (max(0, len(text) - extra_bytes) + 3) // 4 + (extra_bytes + 1) // 2
+
+    @staticmethod
+    def compact(value: str) -> str:
+        """A value that is one JSON document is minified, anything else only loses redundant whitespace"""
+        return PromptEngine.minify_json(value) or PromptEngine.collapse_whitespace(value)
+
+    @staticmethod
+    def minify_json(value: str) -> Optional[str]:
+        """Compact JSON of an object or array document, None if value is not one"""
+        stripped = value.strip()
+        if not stripped.startswith(("{", "[")):
+            return None
+        try:
+            document = json.loads(stripped)
+        except ValueError:
+            return None
+        return json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+
+    @staticmethod
+    def collapse_whitespace(text: str) -> str:
+        """Drops trailing spaces and runs of blank lines; indentation is kept (code must stay valid)"""
+        text = PromptEngine.TRAILING_SPACE_PATTERN.sub("", text.replace("\r\n", "\n"))
+        return PromptEngine.BLANK_LINES_PATTERN.sub("\n\n", text).strip()
+
+    @staticmethod
+    def truncate(text: str, max_tokens: int) -> str:
+        """Keeps the head (2/3) and the tail (1/3) of text within max_tokens, cut at line breaks"""
+        tokens = PromptEngine.estimate_tokens(text)
+        if tokens <= max_tokens:
+            return text
+        keep = max(0, len(text) * max_tokens // tokens - len(PromptEngine.TRUNCATION_MARKER) - 8)
+        head_end = text.rfind("\n", 0, keep * 2 // 3)
+        head_end = head_end if head_end > 0 else keep * 2 // 3
+        tail_start = text.find("\n", len(text) - keep // 3)
+        tail_start = tail_start if tail_start != -1 else len(text) - keep // 3
+        tail_start = max(tail_start, head_end)
+        marker = PromptEngine.TRUNCATION_MARKER.format(count=tail_start - head_end)
+        return text[:head_end] + marker + text[tail_start:].lstrip("\n")
+
+    @staticmethod
+    def _log(stage: str, tokens_before: int, prompt: str) -> None:
+        tokens_after = PromptEngine.estimate_tokens(prompt)
+        saved = 1 - tokens_after / tokens_before if tokens_before else 0.0
+        print(f"Prompt '{stage}': ~{tokens_before} -> ~{tokens_after} tokens ({saved:.0%} smaller, "
+              f"{len(prompt)} characters, budget {PromptEngine.budget(stage)})")
+        if Tracer.ENABLED:
+            Tracer.count("prompt_tokens_before", tokens_before)
+            Tracer.count("prompt_tokens_after", tokens_after)
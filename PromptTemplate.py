@@ -0,0 +1,93 @@
+import os
+import re
+import threading
+from typing import Dict, Iterator, List, TextIO, Tuple
+
+from FilesUtil import FilesUtil
+
+
+class PromptTemplate:
+    """
+    Prompt template compiled once into literal text and {{NAME}} placeholders.
+
+    render() substitutes all placeholders in one pass: the result is built
+    from the pieces once, and a value that itself contains "{{REVIEW}}" is
+    pasted as is instead of being substituted again. Rendering checks the
+    values against the template and raises on missing or unknown names.
+    load() caches compiled templates per file (invalidated when the file's
+    size or mtime changes), so prompts/ is parsed once per process.
+    """
+
+    PLACEHOLDER_PATTERN = re.compile(r"\{\{([A-Z][A-Z0-9_]*)\}\}")
+
+    _cache: Dict[str, Tuple[Tuple[int, int], "PromptTemplate"]] = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, text: str, source: str = "<string>"):
+        self.source = source
+        self.literals: List[str] = []   # literal text around the placeholders, len(names) + 1 items
+        self.names: List[str] = []      # placeholder name after each literal
+        position = 0
+        for match in self.PLACEHOLDER_PATTERN.finditer(text):
+            self.literals.append(text[position:match.start()])
+            self.names.append(match.group(1))
+            position = match.end()
+        self.literals.append(text[position:])
+        self.placeholders = frozenset(self.names)
+
+    @classmethod
+    def load(cls, path: str) -> "PromptTemplate":
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            raise RuntimeError(f"Cannot read file: {path}") from e
+        version = (stat.st_size, stat.st_mtime_ns)
+        with cls._cache_lock:
+            cached = cls._cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        template = cls(FilesUtil.read(path), source=path)
+        with cls._cache_lock:
+            cls._cache[path] = (version, template)
+        return template
+
+    @property
+    def text(self) -> str:
+        """Literal text of the template without the placeholders"""
+        return "".join(self.literals)
+
+    def count(self, name: str) -> int:
+        return self.names.count(name)
+
+    def render(self, **values: str) -> str:
+        return "".join(self.pieces(values))
+
+    def render_to(self, stream: TextIO, **values: str) -> int:
+        """
+        Writes the rendered prompt piece by piece to anything with write(str):
+        an open file, io.StringIO or socket.makefile("w"). Returns the number
+        of characters written.
+        """
+        written = 0
+        for piece in self.pieces(values):
+            stream.write(piece)
+            written += len(piece)
+        return written
+
+    def pieces(self, values: Dict[str, str]) -> Iterator[str]:
+        self.check(values)
+        yield self.literals[0]
+        for name, literal in zip(self.names, self.literals[1:]):
+            yield values[name]
+            yield literal
+
+    def check(self, values: Dict[str, str]) -> None:
+        missing = sorted(self.placeholders - values.keys())
+        unknown = sorted(values.keys() - self.placeholders)
+        if missing or unknown:
+            problems = []
+            if missing:
+                problems.append(f"missing values for {', '.join(missing)}")
+            if unknown:
+                problems.append(f"unknown placeholders {', '.join(unknown)}")
+            raise RuntimeError(f"Template {self.source}: {'; '.join(problems)}")
@@ -0,0 +1,293 @@
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import requests
+
+from AsyncHttpSession import TransportError
+from PromptEngine import PromptEngine
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at per_minute / 60 per second, holding at most
+    burst_seconds worth of tokens. reserve() always succeeds and returns how
+    long the caller has to wait: the balance may go negative, so concurrent
+    callers queue up behind each other instead of polling.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float) -> None:
+        """Returns over-reserved tokens (negative amount takes the missing ones)"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    Client-side flow control of one LLM provider, shared by all threads and
+    coroutines of the process.
+
+    - requests and tokens per minute are spent from token buckets
+      (LLM_RPM_<PROVIDER>, LLM_TPM_<PROVIDER>; 0 - no quota is enforced);
+      a request reserves its estimated prompt tokens plus COMPLETION_TOKENS,
+      the difference to the reported usage is settled after the answer;
+    - the number of requests in flight adapts to the 429 rate (AIMD): every
+      429 halves the limit, every success raises it by 1/limit, up to
+      MAX_CONCURRENCY;
+    - 429 and 5xx answers and connection errors are retried up to
+      MAX_RETRIES times with full-jitter exponential backoff; a Retry-After
+      header pauses all callers of the provider for that long;
+    - BREAKER_FAILURES failures in a row open the circuit: all callers
+      pause for BREAKER_COOLDOWN seconds, then one request at a time probes
+      the provider until it answers again.
+    The answer of the last attempt is returned as is, so the clients report
+    a persistent error the way they did before.
+    """
+
+    MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+    BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+    BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+    BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+    # Completion tokens reserved per request before the real usage is known
+    COMPLETION_TOKENS = int(os.getenv("LLM_COMPLETION_TOKENS", "2000"))
+    RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+    # Poll interval of async callers waiting for a free slot
+    POLL_SECONDS = 0.05
+
+    _registry: Dict[str, "RateLimiter"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0, max_concurrency: int = MAX_CONCURRENCY):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.failures_in_row = 0
+        self.last_decrease = 0.0
+        self.counts = {"requests": 0, "retries": 0, "throttled": 0, "errors": 0, "breaker_opened": 0}
+        self.waited = 0.0
+        self._random = random.Random()
+        self._condition = threading.Condition()
+
+    @classmethod
+    def for_provider(cls, name: str) -> "RateLimiter":
+        """Process-wide limiter of a provider, configured from environment variables"""
+        with cls._registry_lock:
+            limiter = cls._registry.get(name)
+            if limiter is None:
+                limiter = cls(name, float(os.getenv(f"LLM_RPM_{name.upper()}", "0")),
+                              float(os.getenv(f"LLM_TPM_{name.upper()}", "0")))
+                cls._registry[name] = limiter
+            return limiter
+
+    @classmethod
+    def all_stats(cls) -> Dict[str, dict]:
+        with cls._registry_lock:
+            return {name: limiter.stats() for name, limiter in cls._registry.items()}
+
+    def call(self, send: Callable[[], T], prompt: str, usage: Optional[Callable[[T], int]] = None) -> T:
+        """
+        Runs send() (one HTTP request, returning requests.Response) under the
+        limits, retrying throttled and failed attempts. usage(response) gives
+        the tokens the provider actually counted.
+        """
+        reserved = self._estimate(prompt)
+        attempt = 0
+        while True:
+            self._wait(self._enter)
+            try:
+                self._wait_for(self._reserve(reserved))
+                response = send()
+            except requests.RequestException as e:
+                response, error = None, e
+            else:
+                error = None
+            finally:
+                self._leave()
+
+            delay = self._after(attempt, response, error)
+            if delay is None:
+                if error is not None:
+                    raise error
+                self._settle(reserved, response, usage)
+                return response
+            if response is not None:
+                # A dropped streamed response would keep its pool connection (the pool blocks when full)
+                response.close()
+            self._wait_for(delay)
+            attempt += 1
+
+    async def acall(self, send: Callable[[], Awaitable[T]], prompt: str,
+                    usage: Optional[Callable[[T], int]] = None, timeout: Optional[float] = None) -> T:
+        """
+        Async counterpart of call() for AsyncHttpSession: only TransportError is
+        retried. timeout bounds the whole call, waits and retries included.
+        """
+        try:
+            return await asyncio.wait_for(self._acall(send, prompt, usage), timeout)
+        except asyncio.TimeoutError as e:
+            raise RuntimeError(f"Request to {self.name} timed out after {timeout}s") from e
+
+    async def _acall(self, send: Callable[[], Awaitable[T]], prompt: str,
+                     usage: Optional[Callable[[T], int]]) -> T:
+        reserved = self._estimate(prompt)
+        attempt = 0
+        while True:
+            while (wait := self._enter()) > 0:
+                await asyncio.sleep(min(wait, self.POLL_SECONDS))
+            try:
+                await asyncio.sleep(self._reserve(reserved))
+                response = await send()
+            except TransportError as e:
+                response, error = None, e
+            else:
+                error = None
+            finally:
+                self._leave()
+
+            delay = self._after(attempt, response, error)
+            if delay is None:
+                if error is not None:
+                    raise error
+                self._settle(reserved, response, usage)
+                return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {**self.counts, "concurrency_limit": round(self.limit, 2),
+                    "waited_seconds": round(self.waited, 3)}
+
+    def _estimate(self, prompt: str) -> int:
+        return PromptEngine.estimate_tokens(prompt) + self.COMPLETION_TOKENS if self.tokens else 0
+
+    def _enter(self) -> float:
+        """Takes a request slot: 0 on success, otherwise seconds to wait before trying again"""
+        with self._condition:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.in_flight >= int(self.limit):
+                return self.POLL_SECONDS
+            self.in_flight += 1
+            self.counts["requests"] += 1
+            return 0.0
+
+    def _leave(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _reserve(self, tokens: int) -> float:
+        delay = self.requests.reserve(1) if self.requests else 0.0
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def _settle(self, reserved: int, response, usage: Optional[Callable]) -> None:
+        if not (self.tokens and reserved and usage):
+            return
+        try:
+            actual = usage(response)
+        except (ValueError, AttributeError, TypeError):
+            return
+        if actual:
+            self.tokens.refund(reserved - actual)
+
+    def _wait(self, attempt: Callable[[], float]) -> None:
+        with self._condition:
+            while (wait := attempt()) > 0:
+                started = time.monotonic()
+                # Woken early when a slot is released
+                self._condition.wait(wait)
+                self.waited += time.monotonic() - started
+
+    def _wait_for(self, seconds: float) -> None:
+        if seconds > 0:
+            with self._condition:
+                self.waited += seconds
+            time.sleep(seconds)
+
+    def _after(self, attempt: int, response, error: Optional[Exception]) -> Optional[float]:
+        """Records the outcome of an attempt; returns the backoff before the next one, None to stop"""
+        status = None if response is None else getattr(response, "status_code", None) or response.status
+        retryable = error is not None or status in self.RETRY_STATUSES
+        with self._condition:
+            now = time.monotonic()
+            if not retryable:
+                self.failures_in_row = 0
+                if status is not None and status < 400:
+                    # Additive increase after every success
+                    self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+                return None
+
+            retry_after = self._retry_after(response)
+            if status == 429:
+                self.counts["throttled"] += 1
+                # One multiplicative decrease per burst of 429s, not one per in-flight request
+                if now - self.last_decrease >= max(1.0, retry_after or 0.0):
+                    self.limit = max(1.0, self.limit / 2)
+                    self.last_decrease = now
+            else:
+                self.counts["errors"] += 1
+                self.failures_in_row += 1
+                if self.failures_in_row >= self.BREAKER_FAILURES:
+                    self.failures_in_row = 0
+                    self.counts["breaker_opened"] += 1
+                    self.limit = 1.0  # half-open: one probe at a time until a success
+                    self.paused_until = max(self.paused_until, now + self.BREAKER_COOLDOWN)
+                    print(f"Warning: {self.name} failed {self.BREAKER_FAILURES} times in a row, "
+                          f"pausing requests for {self.BREAKER_COOLDOWN:g}s")
+            if retry_after is not None:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+            if attempt >= self.MAX_RETRIES:
+                return None
+            self.counts["retries"] += 1
+            # Full jitter: spreads the retries of concurrent callers over the whole window
+            backoff = self._random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** attempt))
+            return max(backoff, self.paused_until - now)
+
+    @staticmethod
+    def _retry_after(response) -> Optional[float]:
+        """Retry-After in seconds (delta-seconds or HTTP date), None when absent"""
+        if response is None:
+            return None
+        value = next((v for k, v in response.headers.items() if k.lower() == "retry-after"), None)
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
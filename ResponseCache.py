@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache for raw LLM responses.
+
+    Entries live in <directory>/<key[:2]>/<key>.json, where key is a sha256 of
+    provider, model, temperature and prompt. File mtime is the last access time
+    (LRU order), the creation time is stored inside the entry (TTL).
+    """
+
+    DIRECTORY = os.getenv("LLM_CACHE_DIR", ".llm_cache")
+    ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+    MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))  # 0 - entries never expire
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, directory: str = DIRECTORY, max_bytes: int = MAX_BYTES,
+                 ttl_seconds: float = TTL_SECONDS, enabled: bool = ENABLED):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None  # computed lazily on the first write
+
+    @classmethod
+    def default(cls) -> "ResponseCache":
+        """Process-wide cache configured from environment variables"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    @staticmethod
+    def key(provider: str, model: str, temperature: float, prompt: str, system: str = "") -> str:
+        payload = json.dumps(
+            [provider, model, temperature, system, prompt], ensure_ascii=False, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[str]:
+        """Cached response or None; count_miss=False for a look-up that is followed by a counted one"""
+        if not self.enabled:
+            return None
+
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            if count_miss:
+                with self._lock:
+                    self.misses += 1
+            return None
+
+        if self.ttl_seconds and time.time() - entry.get("created", 0) > self.ttl_seconds:
+            with self._lock:
+                self.misses += int(count_miss)
+                if self._total_bytes is not None and path.exists():
+                    self._total_bytes -= path.stat().st_size
+                self._remove(path)
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry["response"]
+
+    def put(self, key: str, response: str, **metadata: Any) -> None:
+        if not self.enabled:
+            return
+
+        path = self._path(key)
+        entry = dict(metadata, created=time.time(), response=response)
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            # Scanned before the write: afterwards the new entry would be counted twice
+            self._ensure_size_known()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            previous = path.stat().st_size if path.exists() else 0
+            os.replace(tmp, path)
+        except OSError as e:
+            raise RuntimeError(f"Cannot write LLM cache entry: {path}") from e
+
+        with self._lock:
+            self._total_bytes += len(data) - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_size_known()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes": self._total_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in self._entries():
+                self._remove(path)
+            self._total_bytes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _entries(self):
+        if not self.directory.is_dir():
+            return []
+        return [p for p in self.directory.glob("*/*.json") if p.is_file()]
+
+    def _ensure_size_known(self) -> None:
+        if self._total_bytes is None:
+            self._total_bytes = sum(p.stat().st_size for p in self._entries())
+
+    def _evict(self) -> None:
+        """Removes least recently used entries until the cache is below 90% of max_bytes"""
+        target = self.max_bytes * 0.9
+        entries = []
+        for p in self._entries():
+            st = p.stat()
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort(key=lambda e: e[0])
+
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._total_bytes <= target:
+                break
+            self._remove(path)
+            self._total_bytes -= size
+            self.evictions += 1
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
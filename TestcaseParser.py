@@ -1,22 +1,113 @@
 import json
-from pathlib import Path
-from typing import Type
+import re
+from typing import Iterator, Type
 
-from model import TestSuite  # предполагается, что у тебя есть класс/датакласс TestSuite
+from model import TestCase, TestSuite
 
 
 class TestcasesParser:
+    CHUNK_SIZE = 1 << 20
+    WHITESPACE_PATTERN = re.compile(r"\s*")
+    KEY_SEPARATOR_PATTERN = re.compile(r"\s*:\s*")
+    SEPARATOR_PATTERN = re.compile(r"[\s,]*")
+    DECODER = json.JSONDecoder(strict=False)
+
     @staticmethod
     def parse(path: str, model: Type[TestSuite] = TestSuite) -> TestSuite:
         """
         Аналог Java-метода parse.
-        Читает JSON-файл и мапит его в объект TestSuite.
+        Читает JSON-файл и мапит его в объект TestSuite с типизированными
+        TestCase. Файл читается потоково (см. iter_testcases), поэтому в
+        памяти не оказывается одновременно весь текст и все промежуточные dict.
         """
         try:
-            json_str = Path(path).read_text(encoding="utf-8")
-            data = json.loads(json_str)
-            # Ожидается, что TestSuite умеет инициализироваться из dict (например, датакласс с **data)
-            return model(**data)
+            return model(list(TestcasesParser.iter_testcases(path)))
         except Exception as e:
             raise RuntimeError("Failed to parse testcases.json") from e
 
+    @staticmethod
+    def iter_testcases(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[TestCase]:
+        """
+        Ленивый разбор: тест-кейсы отдаются по одному, по мере чтения файла
+        кусками по chunk_size символов. Каждый элемент массива "testcases"
+        разбирается raw_decode прямо из буфера; прочитанная часть буфера
+        отбрасывается, так что память не зависит от размера файла.
+        Остальные ключи верхнего уровня пропускаются (см. _array_start).
+        """
+        with open(path, encoding="utf-8") as f:
+            buffer = f.read(chunk_size)
+            eof = not buffer
+
+            while True:
+                pos = TestcasesParser._array_start(buffer)
+                if pos is not None:
+                    break
+                if eof:
+                    raise RuntimeError(f"No 'testcases' array in {path}")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+
+            index = 0
+            while True:
+                pos = TestcasesParser.SEPARATOR_PATTERN.match(buffer, pos).end()
+                if pos < len(buffer) and buffer[pos] == "]":
+                    return
+                if pos < len(buffer):
+                    try:
+                        value, end = TestcasesParser.DECODER.raw_decode(buffer, pos)
+                        # Элемент, упёршийся в конец буфера, мог быть обрезан
+                        complete = eof or end < len(buffer)
+                    except json.JSONDecodeError as e:
+                        if eof:
+                            raise RuntimeError(f"Testcase #{index} in {path}: {e}") from e
+                        complete = False
+                    if complete:
+                        yield TestCase.from_dict(value)
+                        index += 1
+                        pos = end
+                        if pos >= chunk_size:
+                            buffer = buffer[pos:]
+                            pos = 0
+                        continue
+                elif eof:
+                    raise RuntimeError(f"Unterminated 'testcases' array in {path}")
+
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+
+    @staticmethod
+    def _array_start(buffer: str):
+        """
+        Позиция сразу за "[" массива тест-кейсов: файл-массив [ ... или ключ
+        "testcases" объекта верхнего уровня. Значения других ключей
+        разбираются целиком и пропускаются, поэтому вложенный "testcases"
+        (например, {"summary": {"testcases": []}, ...}) не найдётся.
+        None - в буфере пока не хватает данных.
+        """
+        pos = TestcasesParser.WHITESPACE_PATTERN.match(buffer).end()
+        if pos < len(buffer) and buffer[pos] == "[":
+            return pos + 1
+        if pos >= len(buffer) or buffer[pos] != "{":
+            return None
+        pos += 1
+        while True:
+            pos = TestcasesParser.SEPARATOR_PATTERN.match(buffer, pos).end()
+            try:
+                key, pos = TestcasesParser.DECODER.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                return None
+            separator = TestcasesParser.KEY_SEPARATOR_PATTERN.match(buffer, pos)
+            if separator is None:
+                return None
+            pos = separator.end()
+            if key == "testcases":
+                return pos + 1 if pos < len(buffer) and buffer[pos] == "[" else None
+            try:
+                _, pos = TestcasesParser.DECODER.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                return None
+            if pos >= len(buffer):
+                # Число в конце буфера могло быть обрезано
+                return None
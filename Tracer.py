@@ -0,0 +1,266 @@
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Span:
+    """One timed operation: a pipeline stage, an LLM call, a whole run"""
+
+    __slots__ = ("id", "parent", "name", "category", "thread", "start", "end", "args")
+
+    def __init__(self, span_id: int, parent: Optional[int], name: str, category: str, start: float,
+                 args: Dict[str, Any]):
+        self.id = span_id
+        self.parent = parent
+        self.name = name
+        self.category = category
+        self.thread = threading.get_ident()
+        self.start = start
+        self.end: Optional[float] = None
+        self.args = args
+
+    @property
+    def seconds(self) -> float:
+        return (self.end if self.end is not None else Tracer.now()) - self.start
+
+    def set(self, **args: Any) -> None:
+        with Tracer._lock:
+            self.args.update(args)
+
+    def add(self, key: str, amount: int) -> None:
+        # An attached span is counted into from several threads at once
+        with Tracer._lock:
+            self.args[key] = self.args.get(key, 0) + amount
+
+    def finish(self) -> None:
+        if self.end is None:
+            self.end = Tracer.now()
+
+
+class Tracer:
+    """
+    Process-wide collector of spans. Spans opened with span() nest per thread,
+    and FilesUtil I/O is added to every span open in the calling thread.
+    start() creates a span outside the nesting, for work that is suspended and
+    resumed (streams, coroutines); it is still attributed to the enclosing span.
+
+    write() produces a JSON summary (stages, LLM calls, token and byte totals)
+    and a Chrome trace (chrome://tracing, https://ui.perfetto.dev).
+    """
+
+    ENABLED = os.getenv("PIPELINE_TRACE", "1") == "1"
+
+    _lock = threading.Lock()
+    _local = threading.local()
+    _ids = itertools.count(1)
+    _origin = time.perf_counter()
+    _spans: List[Span] = []
+    # Parent of spans started by coroutines (they share one thread, so the thread stack does not apply)
+    _task_parent: contextvars.ContextVar = contextvars.ContextVar("tracer_task_parent", default=None)
+
+    @staticmethod
+    def now() -> float:
+        return time.perf_counter() - Tracer._origin
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._lock:
+            cls._spans = []
+            cls._origin = time.perf_counter()
+
+    @classmethod
+    def start(cls, name: str, category: str, **args: Any) -> Span:
+        stack = cls._stack()
+        parent = stack[-1] if stack else cls._task_parent.get()
+        span = Span(next(cls._ids), parent.id if parent else None, name, category, cls.now(), args)
+        if cls.ENABLED:
+            with cls._lock:
+                cls._spans.append(span)
+        return span
+
+    @classmethod
+    @contextmanager
+    def span(cls, name: str, category: str, **args: Any) -> Iterator[Span]:
+        span = cls.start(name, category, **args)
+        stack = cls._stack()
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            stack.pop()
+            span.finish()
+
+    @classmethod
+    def current(cls) -> List[Span]:
+        """Spans open in this thread, to hand over to worker threads (see attached)"""
+        return list(cls._stack())
+
+    @classmethod
+    @contextmanager
+    def attached(cls, spans: List[Span]) -> Iterator[None]:
+        """Runs the block as if the given spans (of another thread) were open in this thread"""
+        stack = cls._stack()
+        depth = len(stack)
+        stack.extend(spans)
+        try:
+            yield
+        finally:
+            del stack[depth:]
+
+    @classmethod
+    def adopt(cls, span: Optional[Span]) -> None:
+        """Makes span the parent of spans started later in the current asyncio task"""
+        cls._task_parent.set(span)
+
+    @classmethod
+    def count(cls, key: str, amount: int) -> None:
+        """Adds to a counter (bytes_read, bytes_written, ...) of all spans open in this thread"""
+        for span in cls._stack():
+            span.add(key, amount)
+
+    @classmethod
+    def spans(cls) -> List[Span]:
+        with cls._lock:
+            return list(cls._spans)
+
+    @classmethod
+    def take(cls, root: Span) -> List[Span]:
+        """
+        Removes root and all spans below it from the collector and returns them:
+        a long-running process writes the trace of one job and does not keep it.
+        """
+        with cls._lock:
+            by_id = {span.id: span for span in cls._spans}
+            inside: Dict[int, bool] = {root.id: True}
+
+            def belongs(span: Span) -> bool:
+                trail = []
+                node = span
+                while node is not None and node.id not in inside:
+                    trail.append(node.id)
+                    node = by_id.get(node.parent)
+                result = node is not None and inside[node.id]
+                inside.update(dict.fromkeys(trail, result))
+                return result
+
+            taken = [span for span in cls._spans if belongs(span)]
+            cls._spans = [span for span in cls._spans if not inside[span.id]]
+        return taken
+
+    @classmethod
+    def summary(cls, spans: Optional[List[Span]] = None, **extra: Any) -> Dict[str, Any]:
+        spans = cls.spans() if spans is None else spans
+        by_id = {span.id: span for span in spans}
+
+        def owner(span: Span, category: str) -> Optional[Span]:
+            parent = by_id.get(span.parent)
+            while parent is not None and parent.category != category:
+                parent = by_id.get(parent.parent)
+            return parent
+
+        calls = []
+        calls_by_stage: Dict[int, List[Dict[str, Any]]] = {}
+        for span in spans:
+            if span.category != "llm":
+                continue
+            stage = owner(span, "stage")
+            call = {
+                "name": span.name,
+                "stage": stage.name if stage else None,
+                "graph": stage.args.get("graph") if stage else None,
+                "start": round(span.start, 6),
+                "seconds": round(span.seconds, 6),
+                **span.args,
+            }
+            calls.append(call)
+            if stage is not None:
+                calls_by_stage.setdefault(stage.id, []).append(call)
+
+        stages = []
+        for span in spans:
+            if span.category != "stage":
+                continue
+            own_calls = calls_by_stage.get(span.id, [])
+            stages.append({
+                "name": span.name,
+                "start": round(span.start, 6),
+                "seconds": round(span.seconds, 6),
+                "bytes_read": 0,
+                "bytes_written": 0,
+                "llm_calls": len(own_calls),
+                "prompt_tokens": sum(c.get("prompt_tokens", 0) for c in own_calls),
+                "completion_tokens": sum(c.get("completion_tokens", 0) for c in own_calls),
+                **span.args,
+            })
+
+        runs = [{"name": span.name, "start": round(span.start, 6), "seconds": round(span.seconds, 6), **span.args}
+                for span in spans if span.category == "run"]
+
+        ended = [span.end for span in spans if span.end is not None]
+        return {
+            "wall_seconds": round(max(ended, default=0.0) - min((s.start for s in spans), default=0.0), 6),
+            "totals": {
+                "llm_calls": len(calls),
+                "cached_calls": sum(1 for c in calls if c.get("cached")),
+                "llm_seconds": round(sum(c["seconds"] for c in calls), 6),
+                "prompt_tokens": sum(c.get("prompt_tokens", 0) for c in calls),
+                "completion_tokens": sum(c.get("completion_tokens", 0) for c in calls),
+                "bytes_read": sum(s["bytes_read"] for s in stages),
+                "bytes_written": sum(s["bytes_written"] for s in stages),
+                "prompt_tokens_saved": sum(s.get("prompt_tokens_before", 0) - s.get("prompt_tokens_after", 0)
+                                           for s in stages),
+            },
+            "runs": runs,
+            "stages": stages,
+            "llm_calls": calls,
+            **extra,
+        }
+
+    @classmethod
+    def chrome_trace(cls, spans: Optional[List[Span]] = None) -> Dict[str, Any]:
+        """Complete ('X') events in microseconds; time to first byte shown as a nested 'waiting' event"""
+        events = []
+        threads: Dict[int, int] = {}
+        for span in cls.spans() if spans is None else spans:
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append({
+                "name": span.name, "cat": span.category, "ph": "X", "pid": 1, "tid": tid,
+                "ts": round(span.start * 1e6), "dur": round(span.seconds * 1e6),
+                "args": span.args,
+            })
+            if "ttfb" in span.args:
+                events.append({
+                    "name": "waiting", "cat": span.category, "ph": "X", "pid": 1, "tid": tid,
+                    "ts": round(span.start * 1e6), "dur": round(span.args["ttfb"] * 1e6),
+                })
+        for thread, tid in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                           "args": {"name": f"thread-{tid}"}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    @classmethod
+    def write(cls, directory: str, spans: Optional[List[Span]] = None, **extra: Any) -> None:
+        """Writes trace_summary.json and trace.json (of all spans, or the given ones) into directory"""
+        if not cls.ENABLED:
+            return
+        target = Path(directory)
+        target.mkdir(parents=True, exist_ok=True)
+        (target / "trace_summary.json").write_text(
+            json.dumps(cls.summary(spans, **extra), ensure_ascii=False, indent=2), encoding="utf-8")
+        (target / "trace.json").write_text(json.dumps(cls.chrome_trace(spans)), encoding="utf-8")
+
+    @classmethod
+    def _stack(cls) -> List[Span]:
+        stack = getattr(cls._local, "stack", None)
+        if stack is None:
+            stack = cls._local.stack = []
+        return stack
@@ -0,0 +1,144 @@
+# benchmarks/LoadTest.py
+# End-to-end load test of the pipeline against the local mock LLM server. Run from the project root:
+#   python -m benchmarks.LoadTest [--pipelines=16] [--concurrency=1,4,8] [--latency=0.2] [--jitter=0.05]
+#                                 [--error-rate=0] [--rate-429=0] [--slow-rate=0] [--slow-latency=5]
+#                                 [--url=http://host:port] [--json=report.json]
+# LLM_HEDGE=1 sends slow requests to the second provider too (see LlmRouter)
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import GeminiClient
+import MistralClient
+from PipelineRun import PipelineRun
+from PiplineMain import PipelineMain
+from RateLimiter import RateLimiter
+from ResponseCache import ResponseCache
+from Tracer import Tracer
+from benchmarks.MockLlmServer import MockConfig, MockLlmServer, options
+
+
+class LoadTest:
+    """
+    Runs batches of full pipelines at increasing concurrency and reports
+    pipelines per minute plus p50/p95/p99 latency of every stage and LLM call.
+    The response cache is switched off so every pipeline really calls the server.
+    """
+
+    @staticmethod
+    def percentile(values: List[float], q: float) -> float:
+        """Nearest-rank percentile"""
+        ordered = sorted(values)
+        index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+        return ordered[index]
+
+    @staticmethod
+    def point_clients_at(mistral_url: str, gemini_url: str) -> None:
+        MistralClient.MistralClient.API_URL = mistral_url
+        GeminiClient.GeminiClient.API_URL = gemini_url
+        GeminiClient.GeminiClient.API_KEY = GeminiClient.GeminiClient.API_KEY or "mock"
+        os.environ.setdefault("MISTRAL_API_KEY", "mock")
+        ResponseCache.default().enabled = False
+
+    @classmethod
+    def run_level(cls, pipelines: int, concurrency: int, workdir: str) -> Dict:
+        runs = [
+            PipelineRun(
+                name=f"c{concurrency}_{i:03d}",
+                checklist="checklist_submitForm.txt",
+                generated_dir=f"{workdir}/c{concurrency}_{i:03d}/generated",
+                autotests_dir=f"{workdir}/c{concurrency}_{i:03d}/autotests",
+            )
+            for i in range(pipelines)
+        ]
+        Tracer.reset()
+        started = time.perf_counter()
+        # Stage banners of concurrent pipelines would interleave into noise
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = PipelineMain.run_batch(runs, concurrency)
+        wall = time.perf_counter() - started
+
+        latencies: Dict[str, List[float]] = {}
+        for span in Tracer.spans():
+            if span.end is None:
+                continue
+            if span.category == "stage":
+                latencies.setdefault(span.name, []).append(span.seconds)
+            elif span.category == "llm":
+                latencies.setdefault("llm call", []).append(span.seconds)
+                if "ttfb" in span.args:
+                    latencies.setdefault("llm ttfb", []).append(span.args["ttfb"])
+            elif span.category == "hedge":
+                latencies.setdefault("llm answer", []).append(span.seconds)
+
+        succeeded = sum(1 for _, _, error in results if error is None)
+        return {
+            "concurrency": concurrency,
+            "pipelines": pipelines,
+            "succeeded": succeeded,
+            "failed": pipelines - succeeded,
+            "errors": sorted({str(error) for _, _, error in results if error is not None})[:5],
+            "wall_seconds": round(wall, 3),
+            "pipelines_per_minute": round(succeeded / wall * 60, 2),
+            "latency": {
+                name: {f"p{q}": round(cls.percentile(values, q), 4) for q in (50, 95, 99)}
+                for name, values in latencies.items()
+            },
+        }
+
+    @classmethod
+    def run(cls, pipelines: int, levels: List[int], config: MockConfig, url: str = "") -> List[Dict]:
+        server = None
+        if url:
+            base = url.rstrip("/")
+            cls.point_clients_at(f"{base}/v1/chat/completions",
+                                 f"{base}/v1beta/models/gemini-2.5-flash:generateContent?key=")
+        else:
+            server = MockLlmServer(config).start()
+            cls.point_clients_at(server.mistral_url, server.gemini_url)
+
+        reports = []
+        try:
+            with tempfile.TemporaryDirectory() as workdir:
+                for concurrency in levels:
+                    report = cls.run_level(pipelines, concurrency, workdir)
+                    reports.append(report)
+                    cls.print_level(report)
+        finally:
+            if server is not None:
+                print(f"Mock server answers by status: {dict(sorted(server.counts.items()))}")
+            for name, stats in RateLimiter.all_stats().items():
+                print(f"Client limiter {name}: {stats}")
+            if server is not None:
+                server.shutdown()
+        return reports
+
+    @staticmethod
+    def print_level(report: Dict) -> None:
+        print(f"\nconcurrency {report['concurrency']}: {report['succeeded']}/{report['pipelines']} pipelines "
+              f"in {report['wall_seconds']:.2f}s = {report['pipelines_per_minute']:.1f} pipelines/min")
+        for error in report["errors"]:
+            print(f"  error: {error}")
+        print(f"  {'stage':<16} {'p50, s':>8} {'p95, s':>8} {'p99, s':>8}")
+        for name, values in report["latency"].items():
+            print(f"  {name:<16} {values['p50']:>8.3f} {values['p95']:>8.3f} {values['p99']:>8.3f}")
+
+
+if __name__ == "__main__":
+    settings = options(sys.argv[1:], {"pipelines": 16, "concurrency": "1,4,8", "latency": 0.2, "jitter": 0.05,
+                                      "error_rate": 0.0, "rate_429": 0.0, "retry_after": 1.0,
+                                      "slow_rate": 0.0, "slow_latency": 5.0, "url": "", "json": ""})
+    mock = MockConfig(latency=settings["latency"], jitter=settings["jitter"], error_rate=settings["error_rate"],
+                      rate_429=settings["rate_429"], retry_after=settings["retry_after"],
+                      slow_rate=settings["slow_rate"], slow_latency=settings["slow_latency"])
+    results = LoadTest.run(settings["pipelines"], [int(c) for c in settings["concurrency"].split(",")],
+                           mock, settings["url"])
+    if settings["json"]:
+        with open(settings["json"], "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Report saved: {settings['json']}")
@@ -0,0 +1,287 @@
+# benchmarks/MockLlmServer.py
+# Local stand-in for the Mistral and Gemini APIs. Run from the project root:
+#   python -m benchmarks.MockLlmServer [--port=8089] [--latency=0.5] [--jitter=0.2]
+#                                      [--error-rate=0.01] [--rate-429=0.05] [--slow-rate=0.05]
+#                                      [--slow-latency=5] [--responses=DIR]
+# then point the pipeline at it:
+#   MISTRAL_API_URL=http://127.0.0.1:8089/v1/chat/completions MISTRAL_API_KEY=mock LLM_CACHE=0 python PiplineMain.py
+import gzip
+import json
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.2          # mean seconds before the response starts
+    jitter: float = 0.05          # +- uniform spread around latency
+    error_rate: float = 0.0       # share of requests answered with 500
+    rate_429: float = 0.0         # share of requests answered with 429 + Retry-After
+    retry_after: float = 1.0      # Retry-After value for 429 answers, seconds
+    slow_rate: float = 0.0        # share of requests stuck in the latency tail
+    slow_latency: float = 5.0     # latency of those requests, seconds
+    stream_chunk: int = 64        # characters per SSE event
+    stream_delay: float = 0.0     # pause between SSE events, seconds
+    seed: int = 42
+    responses: Dict[str, str] = field(default_factory=dict)  # stage -> canned content override
+
+
+class CannedResponses:
+    """
+    Answers by pipeline stage. The stage is recognised from the prompt text,
+    checked in this order (later prompts embed the output of earlier ones).
+    """
+
+    STAGES = [
+        ("bug_report", ("Based on the following artifacts",)),
+        ("review", ("code review",)),
+        ("autotests", ("autotests", "автотест")),
+        ("testcases", ("JSON",)),
+    ]
+
+    SCENARIOS = "\n".join(
+        f"Scenario {i}: fill in the registration form with variant {i} and submit it." for i in range(1, 21)
+    )
+
+    TESTCASES = json.dumps({"testcases": [
+        {"id": f"TC-{i:03d}", "title": f"Submit the form, variant {i}",
+         "steps": ["Open the form", f"Fill in variant {i}", "Click Submit"],
+         "expected": "The confirmation modal is shown"}
+        for i in range(1, 21)
+    ]}, indent=2)
+
+    TEST_FILE = "\n".join([
+        "import allure",
+        "from pages.form_page import FormPage",
+        "",
+        "",
+        "@allure.title('Submit the form, variant {n}')",
+        "def test_submit_{n}(page):",
+        "    form = FormPage(page)",
+        "    form.open()",
+        "    form.fill(variant={n})",
+        "    form.submit()",
+        "    assert form.modal_title() == 'Thanks for submitting the form'",
+    ])
+
+    @classmethod
+    def autotests(cls, files: int = 10) -> str:
+        parts = ["### Project Code", "", "autotests/README.md", "```markdown", "# Autotests", "",
+                 "## Project Structure", "```", "", "autotests/pytest.ini", "```ini", "[pytest]",
+                 "addopts = --alluredir=../allure-results", "```", "",
+                 "autotests/pages/form_page.py", "```python", "class FormPage:",
+                 "    def __init__(self, page):", "        self.page = page", "```", ""]
+        for n in range(1, files + 1):
+            parts += [f"autotests/tests/test_submit_{n}.py", "```python", cls.TEST_FILE.format(n=n), "```", ""]
+        return "\n".join(parts)
+
+    REVIEW = "The tests follow the Page Object pattern. Consider explicit waits for the modal window."
+
+    BUG_REPORT = json.dumps({"status": "NO_BUGS_FOUND"})
+
+    @classmethod
+    def for_prompt(cls, prompt: str, overrides: Dict[str, str]) -> str:
+        stage = "scenarios"
+        lowered = prompt.lower()
+        for name, markers in cls.STAGES:
+            if any(marker.lower() in lowered for marker in markers):
+                stage = name
+                break
+        if stage in overrides:
+            return overrides[stage]
+        return {
+            "scenarios": cls.SCENARIOS,
+            "testcases": f"Here are the testcases:\n```json\n{cls.TESTCASES}\n```",
+            "autotests": cls.autotests(),
+            "review": cls.REVIEW,
+            "bug_report": cls.BUG_REPORT,
+        }[stage]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """POST /v1/chat/completions (Mistral, JSON or SSE) and POST .../<model>:generateContent (Gemini)"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server: "MockLlmServer" = self.server  # type: ignore[assignment]
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "invalid JSON body"}})
+
+        outcome, delay = server.decide()
+        time.sleep(delay)
+        if outcome == 429:
+            return self._send_json(429, {"error": {"message": "rate limit exceeded", "code": 429}},
+                                   {"Retry-After": f"{server.config.retry_after:g}"})
+        if outcome == 500:
+            return self._send_json(500, {"error": {"message": "mock internal error", "code": 500}})
+
+        gemini = ":generateContent" in self.path
+        prompt = self._prompt(request, gemini)
+        content = CannedResponses.for_prompt(prompt, server.config.responses)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+
+        if gemini:
+            return self._send_json(200, {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": content}]},
+                                "finishReason": "STOP", "index": 0}],
+                "usageMetadata": {"promptTokenCount": usage["prompt_tokens"],
+                                  "candidatesTokenCount": usage["completion_tokens"],
+                                  "totalTokenCount": sum(usage.values())},
+                "modelVersion": "mock",
+            })
+        usage["total_tokens"] = sum(usage.values())
+        if request.get("stream"):
+            return self._send_stream(request.get("model", "mock"), content, usage)
+        return self._send_json(200, {
+            "id": f"mock-{server.next_id()}",
+            "object": "chat.completion",
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    @staticmethod
+    def _prompt(request: dict, gemini: bool) -> str:
+        if gemini:
+            return "\n".join(part.get("text", "") for item in request.get("contents", [])
+                             for part in item.get("parts", []))
+        return "\n".join(str(message.get("content", "")) for message in request.get("messages", [])
+                         if message.get("role") == "user")
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the request (a cancelled hedge): nothing to answer
+            self.close_connection = True
+
+    def _send_stream(self, model: str, content: str, usage: dict) -> None:
+        server: "MockLlmServer" = self.server  # type: ignore[assignment]
+        completion_id = f"mock-{server.next_id()}"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunk = max(1, server.config.stream_chunk)
+        for start in range(0, len(content), chunk):
+            event = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": content[start:start + chunk]},
+                                  "finish_reason": None}]}
+            self.wfile.write(b"data: " + json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n\n")
+            if server.config.stream_delay:
+                self.wfile.flush()
+                time.sleep(server.config.stream_delay)
+        final = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        self.wfile.write(b"data: " + json.dumps(final).encode("utf-8") + b"\n\ndata: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class MockLlmServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: Optional[MockConfig] = None, port: int = 0):
+        super().__init__(("127.0.0.1", port), MockHandler)
+        self.config = config = config or MockConfig()
+        self.counts: Dict[int, int] = {}
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._ids = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @property
+    def mistral_url(self) -> str:
+        return f"{self.base_url}/v1/chat/completions"
+
+    @property
+    def gemini_url(self) -> str:
+        return f"{self.base_url}/v1beta/models/gemini-2.5-flash:generateContent?key="
+
+    def start(self) -> "MockLlmServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def decide(self) -> tuple:
+        """Status (200, 429 or 500) and latency of the next answer; seeded, so runs are repeatable"""
+        config = self.config
+        with self._lock:
+            roll = self._random.random()
+            delay = max(0.0, config.latency + self._random.uniform(-config.jitter, config.jitter))
+            if config.slow_rate and self._random.random() < config.slow_rate:
+                delay = config.slow_latency
+            if roll < config.rate_429:
+                status = 429
+            elif roll < config.rate_429 + config.error_rate:
+                status = 500
+            else:
+                status = 200
+            self.counts[status] = self.counts.get(status, 0) + 1
+        return status, delay
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    @staticmethod
+    def load_responses(directory: str) -> Dict[str, str]:
+        """Recorded answers: <stage>.txt files (scenarios, testcases, autotests, review, bug_report)"""
+        return {path.stem: path.read_text(encoding="utf-8") for path in Path(directory).glob("*.txt")}
+
+
+def options(args, defaults: dict) -> dict:
+    """--name=value options (dashes in names become underscores), cast to the type of the default"""
+    values = dict(defaults)
+    for arg in args:
+        if arg.startswith("--") and "=" in arg:
+            name, value = arg[2:].split("=", 1)
+            name = name.replace("-", "_")
+            if name in values:
+                values[name] = type(values[name])(value) if values[name] is not None else value
+    return values
+
+
+if __name__ == "__main__":
+    settings = options(sys.argv[1:], {"port": 8089, "latency": 0.2, "jitter": 0.05, "error_rate": 0.0,
+                                      "rate_429": 0.0, "retry_after": 1.0, "slow_rate": 0.0,
+                                      "slow_latency": 5.0, "stream_chunk": 64,
+                                      "stream_delay": 0.0, "responses": None})
+    responses_dir = settings.pop("responses")
+    port = settings.pop("port")
+    server = MockLlmServer(MockConfig(**settings, responses=MockLlmServer.load_responses(responses_dir)
+                                      if responses_dir else {}), port)
+    print(f"Mock LLM server on {server.base_url}")
+    print(f"  MISTRAL_API_URL={server.mistral_url}")
+    print(f"  GEMINI_API_URL={server.gemini_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,194 @@
+# benchmarks/PiiBenchmark.py
+# Запуск из корня проекта:
+#   python -m benchmarks.PiiBenchmark [размер_в_МБ ...]
+#   python -m benchmarks.PiiBenchmark stream [размер_в_МБ ...]
+#   python -m benchmarks.PiiBenchmark batch [число_файлов]
+#   python -m benchmarks.PiiBenchmark adversarial
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PiiBatchScanner import PiiBatchScanner
+from PiiEngine import PiiEngine
+
+
+class LegacyPii:
+    """Прежний путь stage 2: PiiScanner.scan (4 прохода) + PiiMasker.mask (3 прохода re.sub)"""
+
+    SCAN_PATTERNS = [
+        (re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", re.IGNORECASE), "EMAIL"),
+        (re.compile(r"\+?[\d\s\-()]{10,}", re.IGNORECASE), "PHONE"),
+        (re.compile(r"(?i)(password|pass|pwd)[\s:=]*['\"]?\S+['\"]?", re.IGNORECASE), "PASSWORD"),
+        (re.compile(r"[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-?[A-Z0-9]{0,5}", re.IGNORECASE),
+         "PRODUCT_KEY"),
+    ]
+
+    @classmethod
+    def scan_and_mask(cls, text: str):
+        findings = []
+        for pattern, pii_type in cls.SCAN_PATTERNS:
+            for match in pattern.finditer(text):
+                findings.append(f"{pii_type}: {match.group()}")
+
+        masked = re.sub(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", "[EMAIL]", text, flags=re.IGNORECASE)
+        masked = re.sub(r"\+?\d[\d\s\-()]{7,}", "[PHONE]", masked)
+        masked = re.sub(r"(?i)(password\s*[:=]\s*)\S+", r"\g<0>[SECRET]", masked, flags=re.IGNORECASE)
+        return findings, masked
+
+
+class PiiBenchmark:
+    """Сравнение однопроходного PiiEngine с прежними раздельными проходами"""
+
+    LINES = [
+        "Verify the first name (First Name) and last name (Last Name).",
+        "Verify the 10-digit mobile number (Mobile).",
+        "Click Submit and check that the modal window with the title appears.",
+        "Verify the State selection from the drop-down list.",
+        "Verify that the results table displays all entered data.",
+    ]
+
+    PII_LINES = [
+        "Verify the correct email (user{n}@example.com).",
+        "Call support at +7 (495) 123-{n:02d}-67 for details.",
+        "Config: password={n}secret",
+        "Key : HMGNV-WCYXV-X7G9W-YCX63-B98R2",
+    ]
+
+    @classmethod
+    def make_checklist(cls, size_bytes: int, pii_ratio: float = 0.1, seed: int = 42) -> str:
+        """Синтетический чеклист заданного размера с долей строк, содержащих PII"""
+        rnd = random.Random(seed)
+        lines = []
+        total = 0
+        n = 0
+        while total < size_bytes:
+            if rnd.random() < pii_ratio:
+                line = rnd.choice(cls.PII_LINES).format(n=n % 100)
+            else:
+                line = rnd.choice(cls.LINES)
+            lines.append(line)
+            total += len(line) + 1
+            n += 1
+        return "\n".join(lines)
+
+    @staticmethod
+    def best_of(func, text: str, repeat: int = 3) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(text)
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    @classmethod
+    def run(cls, sizes_mb=(1, 4, 16)) -> None:
+        print(f"{'size':>8} {'legacy, s':>10} {'engine, s':>10} {'speedup':>8}")
+        for size_mb in sizes_mb:
+            text = cls.make_checklist(int(size_mb * 1024 * 1024))
+            legacy = cls.best_of(LegacyPii.scan_and_mask, text)
+            engine = cls.best_of(PiiEngine.scan_and_mask, text)
+            print(f"{size_mb:>6}MB {legacy:>10.3f} {engine:>10.3f} {legacy / engine:>7.2f}x")
+
+    @classmethod
+    def run_stream(cls, sizes_mb=(16, 64, 256)) -> None:
+        """Пиковая память PiiEngine.mask_file не должна расти вместе с размером файла"""
+        print(f"{'size':>8} {'time, s':>8} {'MB/s':>6} {'peak, MB':>9}")
+        block = cls.make_checklist(4 * 1024 * 1024) + "\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "checklist.txt")
+            dst = os.path.join(tmp, "checklist.masked.txt")
+            for size_mb in sizes_mb:
+                with open(src, "w", encoding="utf-8") as f:
+                    for _ in range(max(1, int(size_mb // 4))):
+                        f.write(block)
+                file_mb = os.path.getsize(src) / (1024 * 1024)
+
+                tracemalloc.start()
+                started = time.perf_counter()
+                PiiEngine.mask_file(src, dst)
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+                print(f"{file_mb:>6.0f}MB {elapsed:>8.2f} {file_mb / elapsed:>6.1f} {peak:>9.1f}")
+
+    @classmethod
+    def run_batch(cls, files: int = 400, file_kb: int = 256) -> None:
+        """Масштабирование PiiBatchScanner по числу процессов"""
+        cpus = os.cpu_count() or 1
+        counts = sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+        with tempfile.TemporaryDirectory() as tmp:
+            for i in range(files):
+                with open(os.path.join(tmp, f"checklist_{i:05d}.txt"), "w", encoding="utf-8") as f:
+                    f.write(cls.make_checklist(file_kb * 1024, seed=i))
+
+            print(f"{files} files x {file_kb}KB, {cpus} CPUs")
+            print(f"{'workers':>8} {'time, s':>8} {'speedup':>8} {'efficiency':>10}")
+            baseline = None
+            for workers in counts:
+                started = time.perf_counter()
+                PiiBatchScanner.scan(tmp, workers=workers)
+                elapsed = time.perf_counter() - started
+                baseline = baseline or elapsed
+                speedup = baseline / elapsed
+                print(f"{workers:>8} {elapsed:>8.2f} {speedup:>7.2f}x {speedup / workers:>9.0%}")
+
+    # Входы, на которых прежние паттерны уходили в квадратичный бэктрекинг
+    ADVERSARIAL = {
+        "local-part run": lambda n: "a" * n + "@",
+        "dotted domain": lambda n: "a@" + "a." * (n // 2) + "1",
+        "digits + parens": lambda n: ("1" + "(" * 9) * (n // 10),
+        "whitespace run": lambda n: "password" + " " * n + "x",
+        "spaced digits": lambda n: "+" + " 1" * (n // 2) + "(",
+        "email-ish tokens": lambda n: ("a1" * 32 + "@") * (n // 65),
+    }
+
+    FUZZ_ALPHABET = ["a", "1", " ", "\t", "-", "(", ")", "+", ".", "@", "%", "pass", ":", "="]
+
+    @classmethod
+    def run_adversarial(cls, sizes=(64 * 1024, 128 * 1024, 256 * 1024, 512 * 1024)) -> bool:
+        """
+        Проверяет, что время сканирования растет линейно: при удвоении входа
+        время должно вырасти не больше чем в GROWTH_LIMIT раз. Прежние
+        паттерны (LegacyPii) показаны для сравнения на небольших входах.
+        """
+        growth_limit = 3.0
+        linear = True
+        rnd = random.Random(7)
+        cases = dict(cls.ADVERSARIAL)
+        cases["random fuzz"] = lambda n: "".join(rnd.choice(cls.FUZZ_ALPHABET) for _ in range(n // 2))
+
+        print(f"{'case':<18} " + " ".join(f"{size // 1024:>7}K" for size in sizes) + f" {'max growth':>11}")
+        for name, make in cases.items():
+            times = []
+            for size in sizes:
+                text = make(size)
+                times.append(cls.best_of(lambda t: PiiEngine.scan_and_mask(t, budget=600), text, repeat=1))
+            growth = max(b / max(a, 1e-6) for a, b in zip(times, times[1:]))
+            verdict = "ok" if growth <= growth_limit else "SUPERLINEAR"
+            linear = linear and growth <= growth_limit
+            print(f"{name:<18} " + " ".join(f"{t:>8.3f}" for t in times) + f" {growth:>10.2f}x {verdict}")
+
+        print("\nLegacy patterns for comparison:")
+        legacy_sizes = (4 * 1024, 8 * 1024, 16 * 1024)
+        for name in ("local-part run", "dotted domain"):
+            times = [cls.best_of(LegacyPii.scan_and_mask, cls.ADVERSARIAL[name](size), repeat=1)
+                     for size in legacy_sizes]
+            print(f"{name:<18} " + " ".join(f"{size // 1024:>3}K {t:.3f}s" for size, t in zip(legacy_sizes, times)))
+
+        return linear
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "stream":
+        PiiBenchmark.run_stream([float(arg) for arg in args[1:]] or (16, 64, 256))
+    elif args and args[0] == "adversarial":
+        sys.exit(0 if PiiBenchmark.run_adversarial() else 1)
+    elif args and args[0] == "batch":
+        PiiBenchmark.run_batch(*(int(arg) for arg in args[1:2]))
+    else:
+        PiiBenchmark.run([float(arg) for arg in args] or (1, 4, 16))
@@ -0,0 +1,311 @@
+# benchmarks/PipelineBenchmark.py
+# Run from the project root:
+#   python -m benchmarks.PipelineBenchmark run [--scale=1] [--repeat=5] [--only=case,case]
+#   python -m benchmarks.PipelineBenchmark save NAME [--scale=1] [--repeat=5]
+#   python -m benchmarks.PipelineBenchmark compare NAME [--threshold=0.2] [--scale=1] [--repeat=5]
+#   python -m benchmarks.PipelineBenchmark check
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from JsonExtractor import JsonExtractor
+from PiiMasker import PiiMasker
+from PiiScanner import PiiScanner
+from AutotestParser import AutotestStreamParser
+from PiplineMain import PipelineMain
+
+
+class SyntheticData:
+    """Seeded generators: the same scale and seed always give byte-identical inputs"""
+
+    CHECKLIST_LINES = [
+        "Verify the first name (First Name) and last name (Last Name) fields accept {n} characters.",
+        "Verify the 10-digit mobile number (Mobile) rejects letters in position {n}.",
+        "Click Submit and check that the modal window with the title appears within {n} ms.",
+        "Verify the State selection from the drop-down list ({n} options).",
+        "Verify that the results table displays all entered data for row {n}.",
+        "Upload a picture of {n} KB and check the file name is shown.",
+    ]
+
+    PII_LINES = [
+        "Contact user{n}@example{m}.com or admin.{n}@corp.example.org about the form.",
+        "Call support at +7 (495) 123-{n:02d}-{m:02d} or +1 415 555 {n:04d}.",
+        "Config: password={n}Secret{m} pwd: 'q{m}w{n}e'",
+        "Key : HMGNV-WCYXV-X7G9W-YCX{m:02d}-B98R2 phone 8 800 200 {n:02d} {m:02d}",
+    ]
+
+    WORDS = ["form", "submit", "page", "field", "modal", "table", "check", "input", "value", "state"]
+
+    def __init__(self, seed: int = 42):
+        self.rnd = random.Random(seed)
+
+    def checklist(self, size_bytes: int, pii_ratio: float = 0.05) -> str:
+        """Large product checklist with occasional PII"""
+        lines = []
+        total = 0
+        while total < size_bytes:
+            n, m = self.rnd.randrange(100), self.rnd.randrange(100)
+            source = self.PII_LINES if self.rnd.random() < pii_ratio else self.CHECKLIST_LINES
+            line = f"{len(lines) + 1}. " + self.rnd.choice(source).format(n=n, m=m)
+            lines.append(line)
+            total += len(line) + 1
+        return "\n".join(lines)
+
+    def pii_dense(self, size_bytes: int) -> str:
+        """Text where most lines carry PII"""
+        return self.checklist(size_bytes, pii_ratio=0.8)
+
+    def testcases_output(self, size_bytes: int) -> str:
+        """Stage 4 LLM answer: prose, a fenced JSON document with nested braces, more prose"""
+        cases = []
+        total = 0
+        while total < size_bytes:
+            case = {
+                "id": f"TC-{len(cases) + 1:05d}",
+                "title": " ".join(self.rnd.choice(self.WORDS) for _ in range(6)),
+                "preconditions": ["Open https://demoqa.com/automation-practice-form"],
+                "steps": [{"action": " ".join(self.rnd.choice(self.WORDS) for _ in range(8)),
+                           "data": {"value": "{x} " * self.rnd.randrange(3)}}
+                          for _ in range(self.rnd.randrange(2, 6))],
+                "expected": "The form is submitted {ok}",
+            }
+            cases.append(case)
+            total += len(json.dumps(case))
+        document = json.dumps({"testcases": cases}, indent=2)
+        return (
+            "Here are the test cases based on the scenarios {as requested}:\n\n```json\n"
+            f"{document}\n```\n\nLet me know if you need more cases {{or changes}}."
+        )
+
+    def bug_report_output(self, size_bytes: int) -> str:
+        """Stage 7 LLM answer: several bug reports as separate objects with braces in the prose"""
+        parts = ["I found the following issues {see details below}:"]
+        total = 0
+        while total < size_bytes:
+            report = {
+                "title": " ".join(self.rnd.choice(self.WORDS) for _ in range(8)),
+                "severity": self.rnd.choice(["Low", "Medium", "High"]),
+                "steps_to_reproduce": [" ".join(self.rnd.choice(self.WORDS) for _ in range(10))
+                                       for _ in range(self.rnd.randrange(2, 8))],
+                "actual_result": "The {value} is not validated",
+                "expected_result": "An error is shown",
+                "evidence": "\n".join(f"line {i}" for i in range(self.rnd.randrange(1, 20))),
+            }
+            text = json.dumps(report, indent=2)
+            parts += [f"Issue {len(parts)}: note the [{self.rnd.choice(self.WORDS)}] field.", "```json", text, "```"]
+            total += len(text)
+        return "\n".join(parts)
+
+    def autotests_output(self, files: int, lines_per_file: int) -> str:
+        """Stage 5 LLM answer: project structure tree followed by many fenced files"""
+        paths = self.project_paths(files)
+        parts = ["Here is the generated project.", "", "Project Structure", self.indented_tree(paths), "",
+                 "### Project Code", ""]
+        for path in paths:
+            language = "python" if path.endswith(".py") else ""
+            body = "\n".join(
+                f"    assert page.{self.rnd.choice(self.WORDS)}_{i}() == '{self.rnd.choice(self.WORDS)}'"
+                for i in range(lines_per_file)
+            )
+            parts += [f"autotests/{path}", f"```{language}", f"def test_{len(parts)}(page):", body, "```", ""]
+        return "\n".join(parts)
+
+    def project_paths(self, files: int) -> list[str]:
+        paths = ["README.md", "pytest.ini", "requirements.txt"]
+        while len(paths) < files:
+            package = self.rnd.choice(["tests", "pages", "utils", "fixtures"])
+            depth = self.rnd.randrange(1, 4)
+            directories = [f"{self.rnd.choice(self.WORDS)}_{self.rnd.randrange(20)}" for _ in range(depth)]
+            paths.append("/".join([package, *directories, f"test_{len(paths)}.py"]))
+        return sorted(set(paths))
+
+    @staticmethod
+    def indented_tree(paths: list[str]) -> str:
+        """Tree with 4-space indentation per level, the format _parse_project_structure reads"""
+        lines = ["autotests/"]
+        seen = set()
+        for path in paths:
+            parts = path.split("/")
+            for depth in range(len(parts)):
+                prefix = tuple(parts[:depth + 1])
+                if prefix in seen:
+                    continue
+                seen.add(prefix)
+                suffix = "/" if depth < len(parts) - 1 else ""
+                lines.append("    " * (depth + 1) + "├── " + parts[depth] + suffix)
+        return "\n".join(lines)
+
+
+class PipelineBenchmark:
+    """
+    CPU-side stages of the pipeline on synthetic inputs. Results are saved as
+    JSON baselines in benchmarks/baselines/ and compared against later runs:
+    a case is a regression when its best time grows by more than the threshold.
+    """
+
+    BASELINE_DIR = Path(__file__).parent / "baselines"
+
+    # LLM answers the parsers once got wrong: name -> (function, input, expected output)
+    CHECKS = {
+        "bare_fence_after_file_block": (
+            PipelineMain._parse_file_contents,
+            "### Project Code\nautotests/conftest.py\n```python\nimport pytest\n```\n\nTo run:\n```\npytest -q\n```",
+            {"autotests/conftest.py": "import pytest"},
+        ),
+        "bare_fence_inside_markdown": (
+            PipelineMain._parse_file_contents,
+            "### Project Code\nautotests/README.md\n```markdown\n# Autotests\n```\nautotests/\n  conftest.py\n```\nRun: pytest\n```",
+            {"autotests/README.md": "# Autotests\n```\nautotests/\n  conftest.py\n```\nRun: pytest"},
+        ),
+    }
+
+    @staticmethod
+    def cases(scale: float = 1.0) -> dict:
+        """name -> (function, input); inputs are generated once per suite run"""
+        data = SyntheticData()
+        mb = int(1024 * 1024 * scale)
+        checklist = data.checklist(4 * mb)
+        dense = data.pii_dense(2 * mb)
+        testcases = data.testcases_output(2 * mb)
+        bug_report = data.bug_report_output(2 * mb)
+        autotests = data.autotests_output(files=max(10, int(400 * scale)), lines_per_file=200)
+        paths = [f"autotests/{p}" for p in data.project_paths(max(10, int(20000 * scale)))]
+        tree = "Project Structure\n" + SyntheticData.indented_tree([p[len("autotests/"):] for p in paths])
+        return {
+            "pii_scan_checklist": (PiiScanner.scan, checklist),
+            "pii_scan_dense": (PiiScanner.scan, dense),
+            "pii_mask_dense": (PiiMasker.mask, dense),
+            "json_extract": (JsonExtractor.extract_json, testcases),
+            "json_extract_bug_report": (JsonExtractor.extract_json, bug_report),
+            "json_extract_all_bug_report": (JsonExtractor.extract_all, bug_report),
+            "parse_file_contents": (PipelineMain._parse_file_contents, autotests),
+            "parse_project_structure": (PipelineMain._parse_project_structure, tree),
+            "generate_tree_string": (lambda p: PipelineMain._generate_tree_string(p, "autotests"), paths),
+        }
+
+    @staticmethod
+    def measure(func, data, repeat: int) -> dict:
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(data)
+            times.append(time.perf_counter() - started)
+        payload = data if isinstance(data, str) else "\n".join(data)
+        size = len(payload.encode("utf-8"))
+        best = min(times)
+        return {
+            "best": round(best, 6),
+            "median": round(statistics.median(times), 6),
+            "input_bytes": size,
+            "input_sha256": hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16],
+            "mb_per_s": round(size / (1024 * 1024) / best, 2) if best else None,
+        }
+
+    @classmethod
+    def check(cls) -> bool:
+        """Runs CHECKS, also through the incremental parser fed in small chunks"""
+        ok = True
+        for name, (func, data, expected) in cls.CHECKS.items():
+            results = [func(data)]
+            if func is PipelineMain._parse_file_contents:
+                parser = AutotestStreamParser()
+                files = [file for i in range(0, len(data), 7) for file in parser.feed(data[i:i + 7])]
+                results.append(dict(files + parser.close()))
+            failed = [result for result in results if result != expected]
+            ok = ok and not failed
+            print(f"{name:<32} {'FAILED: ' + repr(failed[0]) if failed else 'ok'}")
+        return ok
+
+    @classmethod
+    def run(cls, scale: float = 1.0, repeat: int = 5, only=None) -> dict:
+        results = {}
+        print(f"{'case':<26} {'input, MB':>9} {'best, s':>9} {'median, s':>10} {'MB/s':>8}")
+        for name, (func, data) in cls.cases(scale).items():
+            if only and name not in only:
+                continue
+            result = cls.measure(func, data, repeat)
+            results[name] = result
+            print(f"{name:<26} {result['input_bytes'] / (1024 * 1024):>9.2f} {result['best']:>9.4f} "
+                  f"{result['median']:>10.4f} {result['mb_per_s'] or 0:>8.1f}")
+        return {
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "scale": scale,
+            "repeat": repeat,
+            "results": results,
+        }
+
+    @classmethod
+    def save(cls, name: str, report: dict) -> Path:
+        cls.BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+        path = cls.BASELINE_DIR / f"{name}.json"
+        path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Baseline saved: {path}")
+        return path
+
+    @classmethod
+    def compare(cls, name: str, report: dict, threshold: float = 0.2) -> bool:
+        """Prints current vs baseline best times; False if any case regressed beyond threshold"""
+        path = cls.BASELINE_DIR / f"{name}.json"
+        if not path.exists():
+            raise RuntimeError(f"Baseline not found: {path}")
+        baseline = json.loads(path.read_text(encoding="utf-8"))
+        if baseline["environment"] != report["environment"]:
+            print(f"Warning: baseline recorded on {baseline['environment']}, now {report['environment']}")
+        if baseline.get("scale") != report.get("scale"):
+            print(f"Warning: baseline scale {baseline.get('scale')}, now {report.get('scale')}")
+
+        ok = True
+        print(f"\n{'case':<26} {'baseline, s':>11} {'now, s':>9} {'change':>8}")
+        for case, result in report["results"].items():
+            before = baseline["results"].get(case)
+            if before is None:
+                print(f"{case:<26} {'-':>11} {result['best']:>9.4f} {'new':>8}")
+                continue
+            change = result["best"] / before["best"] - 1 if before["best"] else 0.0
+            verdict = ""
+            if before.get("input_sha256") != result["input_sha256"]:
+                verdict = "workload changed"
+            elif change > threshold:
+                verdict = "REGRESSION"
+                ok = False
+            elif change < -threshold:
+                verdict = "faster"
+            print(f"{case:<26} {before['best']:>11.4f} {result['best']:>9.4f} {change:>+7.0%}  {verdict}")
+        print(f"\n{'OK' if ok else 'REGRESSIONS FOUND'} (threshold {threshold:.0%})")
+        return ok
+
+
+def _option(args, name, default, cast):
+    for arg in args:
+        if arg.startswith(f"--{name}="):
+            return cast(arg.split("=", 1)[1])
+    return default
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "run"
+    if command == "check":
+        sys.exit(0 if PipelineBenchmark.check() else 1)
+    positional = [arg for arg in args[1:] if not arg.startswith("--")]
+    scale = _option(args, "scale", 1.0, float)
+    repeat = _option(args, "repeat", 5, int)
+    only = _option(args, "only", None, lambda value: set(value.split(",")))
+
+    report = PipelineBenchmark.run(scale, repeat, only)
+    if command == "save":
+        PipelineBenchmark.save(positional[0] if positional else "baseline", report)
+    elif command == "compare":
+        threshold = _option(args, "threshold", 0.2, float)
+        sys.exit(0 if PipelineBenchmark.compare(positional[0] if positional else "baseline", report, threshold)
+                 else 1)
@@ -0,0 +1,96 @@
+# benchmarks/TestcaseBenchmark.py
+# Time and memory of loading a large testcases.json. Run from the project root:
+#   python -m benchmarks.TestcaseBenchmark [--cases=100000] [--repeat=3]
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from TestcaseParser import TestcasesParser
+from benchmarks.MockLlmServer import options
+from benchmarks.PipelineBenchmark import SyntheticData
+
+
+class TestcaseBenchmark:
+    """
+    Compares the legacy loader (json.loads of the whole file, testcases kept
+    as raw dicts) with TestcasesParser.parse (typed, slotted TestCase objects)
+    and TestcasesParser.iter_testcases (lazy, one testcase alive at a time).
+    "retained" is the memory still held by the result, "peak" the high-water
+    mark while loading; both come from tracemalloc.
+    """
+
+    TYPES = ["positive", "negative", "boundary", "ui"]
+
+    @classmethod
+    def write_file(cls, path: str, cases: int) -> int:
+        data = SyntheticData()
+        words = data.WORDS
+        testcases = [
+            {
+                "id": f"TC-{i:06d}",
+                "title": " ".join(data.rnd.choice(words) for _ in range(6)),
+                "type": data.rnd.choice(cls.TYPES),
+                "steps": [" ".join(data.rnd.choice(words) for _ in range(8))
+                          for _ in range(data.rnd.randrange(2, 6))],
+                "expected": "The form is submitted",
+            }
+            for i in range(cases)
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"testcases": testcases}, f, indent=2, ensure_ascii=False)
+        return os.path.getsize(path)
+
+    @staticmethod
+    def legacy_load(path: str):
+        with open(path, encoding="utf-8") as f:
+            return json.loads(f.read())["testcases"]
+
+    @staticmethod
+    def typed_load(path: str):
+        return TestcasesParser.parse(path).testcases
+
+    @staticmethod
+    def lazy_count(path: str):
+        return sum(1 for _ in TestcasesParser.iter_testcases(path))
+
+    @staticmethod
+    def measure(func: Callable, path: str, repeat: int) -> Dict:
+        times = []
+        for _ in range(repeat):
+            gc.collect()
+            started = time.perf_counter()
+            func(path)
+            times.append(time.perf_counter() - started)
+
+        gc.collect()
+        tracemalloc.start()
+        result = func(path)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        return {"best": min(times), "retained": retained, "peak": peak}
+
+    @classmethod
+    def run(cls, cases: int, repeat: int) -> Dict[str, Dict]:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "testcases.json")
+            size = cls.write_file(path, cases)
+            print(f"{cases} testcases, {size / (1024 * 1024):.1f} MB\n")
+            print(f"{'loader':<14} {'best, s':>9} {'retained, MB':>13} {'peak, MB':>9}")
+            results = {}
+            for name, func in (("legacy", cls.legacy_load), ("typed", cls.typed_load),
+                               ("lazy", cls.lazy_count)):
+                result = results[name] = cls.measure(func, path, repeat)
+                print(f"{name:<14} {result['best']:>9.3f} {result['retained'] / (1024 * 1024):>13.1f} "
+                      f"{result['peak'] / (1024 * 1024):>9.1f}")
+        return results
+
+
+if __name__ == "__main__":
+    settings = options(sys.argv[1:], {"cases": 100000, "repeat": 3})
+    TestcaseBenchmark.run(settings["cases"], settings["repeat"])
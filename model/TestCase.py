@@ -1,12 +1,47 @@
 # model/TestCase.py
+import sys
 from dataclasses import dataclass
-from typing import List
+from typing import Any, Dict, Tuple
 
 
-@dataclass
+@dataclass(slots=True)
 class TestCase:
     id: str
     title: str
     type: str
-    steps: List[str]
-    expected: str
\ No newline at end of file
+    steps: Tuple[str, ...]
+    expected: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TestCase":
+        """
+        Проверяет и преобразует тест-кейс из JSON. id может прийти числом,
+        steps - списком строк; повторяющиеся значения type (positive,
+        negative, ...) интернируются, чтобы 100k кейсов делили одни строки.
+        """
+        try:
+            case_id, title, case_type, steps, expected = (
+                data["id"], data["title"], data["type"], data["steps"], data["expected"])
+        except (KeyError, TypeError):
+            raise RuntimeError(TestCase._describe_invalid(data)) from None
+
+        if type(case_id) is not str:
+            if type(case_id) is not int:
+                raise RuntimeError(f"Testcase id must be a string or a number, got {case_id!r}")
+            case_id = str(case_id)
+        if not (type(title) is str and type(case_type) is str and type(expected) is str):
+            raise RuntimeError(f"Testcase {case_id}: 'title', 'type' and 'expected' must be strings")
+        if type(steps) is not list:
+            raise RuntimeError(f"Testcase {case_id}: 'steps' must be a list of strings")
+        for step in steps:
+            if type(step) is not str:
+                raise RuntimeError(f"Testcase {case_id}: 'steps' must be a list of strings")
+
+        return cls(case_id, title, sys.intern(case_type), tuple(steps), expected)
+
+    @staticmethod
+    def _describe_invalid(data: Any) -> str:
+        if not isinstance(data, dict):
+            return f"Testcase must be an object, got {type(data).__name__}"
+        missing = [name for name in ("id", "title", "type", "steps", "expected") if name not in data]
+        return f"Testcase {data.get('id', '?')}: missing {', '.join(missing)}"
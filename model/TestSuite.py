@@ -1,10 +1,16 @@
 # model/TestSuite.py
 from dataclasses import dataclass
-from typing import List
+from typing import Any, Dict, List
 
-from TestCase import TestCase
+from model.TestCase import TestCase
 
 
-@dataclass
+@dataclass(slots=True)
 class TestSuite:
     testcases: List[TestCase]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TestSuite":
+        if not isinstance(data, dict) or not isinstance(data.get("testcases"), list):
+            raise RuntimeError("Testcases JSON must be an object with a 'testcases' array")
+        return cls([TestCase.from_dict(item) for item in data["testcases"]])
@@ -0,0 +1,2 @@
+from model.TestCase import TestCase
+from model.TestSuite import TestSuite